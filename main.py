@@ -1,14 +1,34 @@
 import os
+import re
 import time
+import asyncio
 import shutil
 import zipfile
 import datetime
-import base64
+import mmap
+import secrets
+import heapq
 from os import listdir
-from os.path import isfile, join
-from functools import partial
+from os.path import basename, isfile, join
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from operator import itemgetter
+from urllib.parse import quote
 from dotenv import load_dotenv
-from nicegui import ui, events, app
+from fastapi import HTTPException, Request, Response
+from nicegui import Client, app, background_tasks, events, ui
+
+try:
+    # SIMD base64, several times faster on the large videos embedded into downloads
+    from pybase64 import b64encode
+except ImportError:
+    from base64 import b64encode
+
+try:
+    from watchfiles import awatch
+except ImportError:
+    awatch = None
 
 from data.const import LANGUAGES, INVERTED_LANGUAGES
 from src.util import time_estimate
@@ -27,33 +47,213 @@ WINDOWS = os.getenv("WINDOWS") == "True"
 SSL_CERTFILE = os.getenv("SSL_CERTFILE")
 SSL_KEYFILE = os.getenv("SSL_KEYFILE")
 SUMMARIZATION = os.getenv("SUMMARIZATION") == "True"
+MEDIA_ACCEL_REDIRECT = os.getenv("MEDIA_ACCEL_REDIRECT")
 
 if WINDOWS:
     os.environ["PATH"] += os.pathsep + "ffmpeg/bin"
     os.environ["PATH"] += os.pathsep + "ffmpeg"
 
 BACKSLASHCHAR = "\\"
-user_storage = {}
+ESCAPED_UNDERSCORE = BACKSLASHCHAR + "_"
+# Built once; ui.select only reads the options list
+LANGUAGE_OPTIONS = list(LANGUAGES.values())
+DEFAULT_LANGUAGE = LANGUAGES["de"]
+EDITOR_CONTENT_JS = """
+var content = String(doc.documentElement.innerHTML);
+content = content.slice(content.indexOf('</nav>') + '</nav>'.length, content.indexOf('var fileName = '));
+"""
+EDITOR_PAGE_SUFFIX = ".editor.html"
+EDITOR_FRAME_STYLE = "width: 100%; height: calc(100vh - 32px); border: 0;"
+VIDEO_LOADER_JS = b"""";
+var binary = atob(base64str);
+var len = binary.length;
+var buffer = new ArrayBuffer(len);
+var view = new Uint8Array(buffer);
+for (var i = 0; i < len; i++) {
+    view[i] = binary.charCodeAt(i);
+}
+
+var blob = new Blob([view], { type: "video/MP4" });
+var url = URL.createObjectURL(blob);
+
+var video = document.getElementById("player");
+
+setTimeout(function() {
+  video.pause();
+  video.setAttribute('src', url);
+}, 100);
+</script>
+"""
+# Used in zip downloads, where the video is a file next to the editor. File URLs can't be fetched, but played.
+VIDEO_LINK_JS = b"""
+var video = document.getElementById("player");
+
+setTimeout(function() {
+  video.pause();
+  video.setAttribute('src', "{src}");
+}, 100);
+</script>
+"""
+NAV_END = b"</nav>"
+FILE_NAME_VAR = b"var fileName = "
+SCRIPT_END = b"</script>"
+BASE64_VAR = b"var base64str = "
+VIEWER_PLACEHOLDER = b"<div>Bitte den Editor herunterladen, um den Viewer zu erstellen.</div>"
+VIEWER_LINK = b'<a href="#" id="viewer-link" onclick="viewerClick()" class="btn btn-primary">Viewer erstellen</a>'
+DOWNLOAD_MARKERS = (NAV_END, FILE_NAME_VAR, SCRIPT_END, BASE64_VAR, VIEWER_PLACEHOLDER)
+DOWNLOAD_MARKERS_RE = re.compile(b"|".join(re.escape(marker) for marker in DOWNLOAD_MARKERS))
+# The online editor can't build a viewer; matches the link as written by src/viewer.py and by prepare_download
+EDITOR_VIEWER_LINK_RE = re.compile(
+    r'<a href ?="#" id="viewer-link" on[cC]lick="viewerClick\(\)" class="btn btn-primary">Viewer erstellen</a>'
+)
+EDITOR_VIEWER_PLACEHOLDER = VIEWER_PLACEHOLDER.decode()
+UPLOAD_SUFFIX = ".partial"
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+# Multiple of 3 so the encoded chunks concatenate without padding
+BASE64_CHUNK_SIZE = 3 * 1024 * 1024
+LISTEN_MAX_IDLE = 10
+DATA_DIR_FALLBACK_POLL = 5
+HIDDEN_PAGE_INTERVAL = 60
+HOTWORDS_SAVE_DELAY = 0.5
+MAX_STORED_USERS = 1024
+MAX_EDITOR_SAVE_TOKENS = 1024
+MAX_EDITOR_PAGES = 16
+DIR_SNAPSHOT_SETTLE = 2
+MAX_WORKER_FILE_PARTS = 4096
+# Videos are private and their names can be reused after a deletion, so cache them privately and not forever
+MEDIA_CACHE_CONTROL = "private, max-age=3600"
+user_storage = OrderedDict()
+editor_save_tokens = OrderedDict()
+editor_pages = OrderedDict()
+file_view_events = {}
+file_view_versions = {}
+dir_snapshots = {}
+queue_estimates = {}
+pending_estimates = set()
+tmp_dir_removals = set()
+# The name of a progress file never changes its meaning, so each one is only parsed once
+worker_file_parts = {}
+
+
+def user_state(user_id):
+    """Return the in-memory state of a user, creating it again if it is missing or was evicted."""
+    state = user_storage.get(user_id)
+    if state is None:
+        state = user_storage[user_id] = {
+            "uploaded_files": set(),
+            "file_list": [],
+            "queue_items": (),
+            "result_items": (),
+            "error_items": (),
+            "content": "",
+            "content_filename": "",
+            "file_in_progress": None,
+            "known_errors": set(),
+        }
+    return state
+
+
+def evict_users(keep):
+    """Drop the least recently opened users beyond MAX_STORED_USERS, except those with an open page."""
+    for user_id in list(user_storage):
+        if len(user_storage) <= MAX_STORED_USERS:
+            break
+        if user_id != keep and not file_view_events.get(user_id):
+            del user_storage[user_id]
+
+
+@lru_cache(maxsize=None)
+def user_dir(kind, user_id):
+    """Return the data/<kind>/<user_id> directory, computed once per user."""
+    return join(ROOT, "data", kind, user_id)
+
+
+def display_sort_key(file_status):
+    """Order files by progress, newest first, then by name."""
+    return (file_status[2], -file_status[4], file_status[0])
+
+
+@lru_cache(maxsize=4096)
+def display_name(file_name):
+    """File name for markdown; underscores are escaped so they aren't read as emphasis."""
+    return file_name.replace("_", ESCAPED_UNDERSCORE)
+
+
+def queue_label(file_status):
+    """Markdown label of a queued file."""
+    return f"<b>{display_name(file_status[0])}:</b> {file_status[1]}"
+
+
+def dir_snapshot(path):
+    """Return {name: (is_file, mtime)} for the entries of path.
+
+    The listing is cached and only rescanned when the directory's own mtime changes, i.e. when
+    entries were added, removed or renamed. Directories modified within the last DIR_SNAPSHOT_SETTLE
+    seconds are not cached, so changes landing in the same mtime tick as the scan are not missed.
+    """
+    try:
+        dir_mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        dir_snapshots.pop(path, None)
+        return {}
+    cached = dir_snapshots.get(path)
+    if cached and cached[0] == dir_mtime:
+        return cached[1]
+    entries = {}
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                entries[entry.name] = (entry.is_file(), entry.stat().st_mtime)
+            except FileNotFoundError:
+                continue
+    if time.time_ns() - dir_mtime > DIR_SNAPSHOT_SETTLE * 1_000_000_000:
+        dir_snapshots[path] = (dir_mtime, entries)
+    else:
+        dir_snapshots.pop(path, None)
+    return entries
+
+
+async def estimate_in_background(key, file_path):
+    """Estimate the transcription time of a queued file in a thread, then wake the file views to show it."""
+    try:
+        estimated_time, _ = await asyncio.to_thread(time_estimate, file_path, ONLINE)
+    except Exception as e:
+        print(f"Error estimating {file_path}: {str(e)}")
+        estimated_time = -1
+    finally:
+        pending_estimates.discard(key)
+    queue_estimates[key] = max(estimated_time, 0)
+    for user_id in list(file_view_events):
+        notify_file_view(user_id)
 
 
 def read_files(user_id):
     """Read in all files of the user and set the file status if known."""
-    user_storage[user_id]["file_list"] = []
-    in_path = join(ROOT, "data", "in", user_id)
-    out_path = join(ROOT, "data", "out", user_id)
-    error_path = join(ROOT, "data", "error", user_id)
-
-    if os.path.exists(in_path):
-        for f in listdir(in_path):
-            if isfile(join(in_path, f)) and f != "hotwords.txt" and f != "language.txt" and not f.endswith(".processing"):
+    user_state(user_id)["file_list"] = []
+    user_storage[user_id]["pending"] = []
+    in_path = user_dir("in", user_id)
+    out_path = user_dir("out", user_id)
+    error_path = user_dir("error", user_id)
+
+    in_entries = dir_snapshot(in_path)
+    if in_entries:
+        out_entries = dir_snapshot(out_path)
+        for f, (is_file, mtime) in in_entries.items():
+            if (
+                is_file
+                and f != "hotwords.txt"
+                and f != "language.txt"
+                and not f.endswith(".processing")
+                and not f.endswith(UPLOAD_SUFFIX)
+            ):
                 file_status = [
                     f,
                     "Datei in Warteschlange. Geschätzte Wartezeit: ",
                     0.0,
                     0,
-                    os.path.getmtime(join(in_path, f)),
+                    mtime,
                 ]
-                if isfile(join(out_path, f + ".html")):
+                if out_entries.get(f + ".html", (False,))[0]:
                     file_status[1] = "Datei transkribiert"
                     file_status[2] = 100.0
                     file_status[3] = 0
@@ -63,82 +263,143 @@ def read_files(user_id):
 
                 user_storage[user_id]["file_list"].append(file_status)
 
-        files_in_queue = []
-        for u in user_storage:
-            for f in user_storage[u].get("file_list", []):
-                if (
-                    "updates" in user_storage[u]
-                    and len(user_storage[u]["updates"]) > 0
-                    and user_storage[u]["updates"][0] == f[0]
-                ):
-                    f = user_storage[u]["updates"]
-                if f[2] < 100.0:
-                    files_in_queue.append(f)
-
-        # Sort the queue by modification time (older files first)
-        sorted_queue = sorted(files_in_queue, key=lambda x: x[4])
-        
-        # Second pass: Calculate time estimates ONLY for the first 10 files in queue
-        for i, file_status in enumerate(sorted_queue[:10]):
-            # Get user_id and filename for this queue entry
-            for u in user_storage:
-                for idx, f in enumerate(user_storage[u].get("file_list", [])):
-                    if f[0] == file_status[0] and f[2] < 100.0:
-                        # Found the file - calculate estimate
-                        file_path = join(ROOT, "data", "in", u, f[0])
-                        estimated_time, _ = time_estimate(file_path, ONLINE)
-                        if estimated_time == -1:
-                            estimated_time = 0
-                        # Update both places where we store this info
-                        sorted_queue[i][3] = estimated_time
-                        user_storage[u]["file_list"][idx][3] = estimated_time
-                        break
+        # Keep this user's pending files sorted by modification time (older files first), so the
+        # global queue is a merge of already sorted per-user lists instead of a full re-sort.
+        # Entries carry their owner, so estimates don't need to search every user's file list.
+        updates = user_storage[user_id].get("updates")
+        pending = []
+        for f in user_storage[user_id]["file_list"]:
+            if updates and updates[0] == f[0]:
+                f = updates
+            if f[2] < 100.0:
+                pending.append((f[4], user_id, f))
+        pending.sort(key=itemgetter(0))
+        user_storage[user_id]["pending"] = pending
+
+        queue = list(heapq.merge(*(user_storage[u].get("pending", []) for u in user_storage), key=itemgetter(0)))
+        sorted_queue = [f for _, _, f in queue]
+
+        # Second pass: Calculate time estimates ONLY for the first 10 files in queue.
+        # Each estimate runs ffprobe, so reuse it across refreshes until the file changes.
+        # New ones are computed off the event loop and count as 0 until they are ready.
+        estimates = {}
+        for _, u, f in queue[:10]:
+            key = (u, f[0], f[4])
+            estimated_time = queue_estimates.get(key)
+            if estimated_time is None:
+                if key not in pending_estimates:
+                    pending_estimates.add(key)
+                    background_tasks.create(estimate_in_background(key, join(user_dir("in", u), f[0])))
+                estimated_time = 0
+            else:
+                estimates[key] = estimated_time
+            f[3] = estimated_time
+        queue_estimates.clear()
+        queue_estimates.update(estimates)
+
+        # Positions and accumulated waiting time in one pass, instead of a scan of the queue per file
+        position_by_name = {}
+        wait_prefix = [0]
+        for i, (_, u, f) in enumerate(queue):
+            position_by_name[(u, f[0])] = i + 1
+            wait_prefix.append(wait_prefix[-1] + f[3])
+        queue_size = len(sorted_queue)
 
         for file_status in user_storage[user_id]["file_list"]:
             if file_status[2] < 100.0:
                 # Get position in queue (1-based)
-                queue_position = next((i + 1 for i, f in enumerate(sorted_queue) if f[0] == file_status[0]), 0)
+                queue_position = position_by_name.get((user_id, file_status[0]), 0)
                 
                 # If currently processing, show as position 1
-                if "updates" in user_storage[user_id] and len(user_storage[user_id]["updates"]) > 0 and user_storage[user_id]["updates"][0] == file_status[0]:
+                if updates and updates[0] == file_status[0]:
                     queue_position = 1
                 
-                # Get total queue size
-                queue_size = len(sorted_queue)
-                
                 # Only show wait time for files in the first 10 positions
                 if queue_position <= 10:
                     # Calculate estimated wait time for files in first 10 positions
-                    estimated_wait_time = sum(f[3] for f in files_in_queue if f[4] < file_status[4])
+                    estimated_wait_time = wait_prefix[queue_position - 1] if queue_position else 0
                     wait_time_str = str(datetime.timedelta(seconds=round(estimated_wait_time + file_status[3])))
                     file_status[1] = f"Position {queue_position}/{queue_size} in der Warteschlange. Geschätzte Wartezeit: {wait_time_str}"
                 else:
                     # For positions >10: only show position, no wait time
                     file_status[1] = f"Position {queue_position}/{queue_size} in der Warteschlange."
 
-    if os.path.exists(error_path):
-        for f in listdir(error_path):
-            if isfile(join(error_path, f)) and not f.endswith(".txt"):
+    error_entries = dir_snapshot(error_path)
+    if error_entries:
+        # Error texts rarely change, so only re-read a .txt file when its mtime differs from the cached one.
+        # The mtime comes from the file itself: rewriting it in place doesn't change the cached directory listing.
+        error_cache = user_storage[user_id].setdefault("error_cache", {})
+        for f, (is_file, mtime) in error_entries.items():
+            if is_file and not f.endswith(".txt"):
                 text = "Transkription fehlgeschlagen"
-                error_file = join(error_path, f + ".txt")
-                if isfile(error_file):
-                    with open(error_file, "r") as txtf:
-                        content = txtf.read()
-                        if content:
-                            text = content
-                file_status = [f, text, -1, 0, os.path.getmtime(join(error_path, f))]
+                if error_entries.get(f + ".txt", (False, None))[0]:
+                    txt_path = join(error_path, f + ".txt")
+                    try:
+                        error_mtime = os.stat(txt_path).st_mtime_ns
+                        cached = error_cache.get(f)
+                        if cached is not None and cached[0] == error_mtime:
+                            content = cached[1]
+                        else:
+                            with open(txt_path, "r") as txtf:
+                                content = txtf.read()
+                            error_cache[f] = (error_mtime, content)
+                    except FileNotFoundError:
+                        content = ""
+                    if content:
+                        text = content
+                file_status = [f, text, -1, 0, mtime]
                 if f not in user_storage[user_id]["known_errors"]:
                     user_storage[user_id]["known_errors"].add(f)
                 user_storage[user_id]["file_list"].append(file_status)
+        # Forget texts of deleted errors, so the cache only holds what is on disk
+        for f in [f for f in error_cache if f not in error_entries]:
+            del error_cache[f]
+
+    user_storage[user_id]["file_list"].sort(key=itemgetter(0))
+    # Position of each name in file_list, so listen() can replace the entry of the file in progress directly
+    file_index = {}
+    for i, file_status in enumerate(user_storage[user_id]["file_list"]):
+        file_index.setdefault(file_status[0], i)
+    user_storage[user_id]["file_index"] = file_index
+    # Sort and partition once for display so display_queue and display_results only walk their own entries.
+    updates = user_storage[user_id].get("updates")
+    queue_items, result_items, error_items = [], [], []
+    for file_status in sorted(user_storage[user_id]["file_list"], key=display_sort_key):
+        if updates and updates[0] == file_status[0]:
+            file_status = updates
+        if 0 <= file_status[2] < 100.0:
+            queue_items.append(file_status)
+        elif file_status[2] >= 100.0:
+            result_items.append(file_status)
+        elif file_status[2] == -1:
+            error_items.append(file_status)
+    user_storage[user_id]["queue_items"] = tuple(queue_items)
+    user_storage[user_id]["result_items"] = tuple(result_items)
+    user_storage[user_id]["error_items"] = tuple(error_items)
+
+
+def write_text(file_path, content):
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(content)
+
 
-    user_storage[user_id]["file_list"].sort()
+def write_if_changed(file_path, content):
+    """Write content to file_path unless the file already holds exactly this content."""
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            if f.read() == content:
+                return
+    except (OSError, UnicodeDecodeError):
+        pass
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(content)
 
 
 async def handle_upload(e: events.UploadEventArguments, user_id):
     """Save the uploaded file to disk."""
-    in_path = join(ROOT, "data", "in", user_id)
-    out_path = join(ROOT, "data", "out", user_id)
-    error_path = join(ROOT, "data", "error", user_id)
+    in_path = user_dir("in", user_id)
+    out_path = user_dir("out", user_id)
+    error_path = user_dir("error", user_id)
 
     os.makedirs(in_path, exist_ok=True)
     os.makedirs(out_path, exist_ok=True)
@@ -147,8 +408,7 @@ async def handle_upload(e: events.UploadEventArguments, user_id):
 
     # Clean up error files if re-uploading
     if os.path.exists(error_path):
-        if file_name in user_storage[user_id]["known_errors"]:
-            user_storage[user_id]["known_errors"].remove(file_name)
+        user_state(user_id)["known_errors"].discard(file_name)
         error_file = join(error_path, file_name)
         error_txt_file = error_file + ".txt"
         if os.path.exists(error_file):
@@ -156,40 +416,41 @@ async def handle_upload(e: events.UploadEventArguments, user_id):
         if os.path.exists(error_txt_file):
             os.remove(error_txt_file)
 
-    # Ensure unique file names
-    original_file_name = file_name
-    for i in range(1, 10001):
-        if isfile(join(in_path, file_name)):
-            name, ext = os.path.splitext(original_file_name)
-            file_name = f"{name}_{i}{ext}"
-        else:
-            break
-    else:
-        ui.notify("Zu viele Dateien mit dem gleichen Namen.")
-        return
+    # Ensure unique file names, checked against one listing of the directory instead of a stat per candidate.
+    # Uploads still being copied count as taken too, they are saved in a thread while other uploads arrive.
+    existing = dir_snapshot(in_path)
+
+    def taken(candidate):
+        return candidate in existing or candidate + UPLOAD_SUFFIX in existing
+
+    if taken(file_name):
+        name, ext = os.path.splitext(file_name)
+        file_name = next((f"{name}_{i}{ext}" for i in range(1, 10001) if not taken(f"{name}_{i}{ext}")), None)
+        if file_name is None:
+            ui.notify("Zu viele Dateien mit dem gleichen Namen.")
+            return
 
     # Save hotwords if provided
+    flush_hotwords(user_id)
     hotwords_content = app.storage.user.get(f"{user_id}_vocab", "").strip()
     hotwords_file = join(in_path, "hotwords.txt")
     if hotwords_content:
-        with open(hotwords_file, "w") as f:
-            f.write(hotwords_content)
+        write_if_changed(hotwords_file, hotwords_content)
     elif isfile(hotwords_file):
         os.remove(hotwords_file)
 
     # Save the selected language
     language = app.storage.user.get(f"{user_id}_language", "").strip()
-    language_file = join(in_path, "language.txt")
-    if language:
-        with open(language_file, "w") as f:
-            f.write(language)
-    else:
-        with open(language_file, "w") as f:
-            f.write("de")
+    write_if_changed(join(in_path, "language.txt"), language or "de")
 
-    # Save the uploaded file
-    with open(join(in_path, file_name), "wb") as f:
-        f.write(e.content.read())
+    # Save the uploaded file in chunks; the upload is already spooled to disk, so memory stays bounded.
+    # It only gets its real name once complete, so the worker never picks up a half-written file.
+    # The copy of up to 12GB runs in a thread, so it doesn't block the event loop for other clients.
+    file_path = join(in_path, file_name)
+    with open(file_path + UPLOAD_SUFFIX, "wb") as f:
+        await asyncio.to_thread(shutil.copyfileobj, e.content, f, UPLOAD_CHUNK_SIZE)
+    os.replace(file_path + UPLOAD_SUFFIX, file_path)
+    notify_file_view(user_id)
 
 
 def handle_reject(e: events.GenericEventArguments):
@@ -202,69 +463,123 @@ def handle_added(e: events.GenericEventArguments, user_id, upload_element, refre
     refresh_file_view(user_id=user_id, refresh_queue=True, refresh_results=False)
 
 
-def prepare_download(file_name, user_id):
-    """Add offline functions to the editor before downloading."""
-    out_user_dir = join(ROOT, "data", "out", user_id)
-    full_file_name = join(out_user_dir, file_name + ".html")
+def write_base64(file_path, out):
+    """Write the base64 encoding of file_path to the binary stream out, chunk by chunk."""
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for i in range(0, len(mm), BASE64_CHUNK_SIZE):
+                out.write(b64encode(mm[i : i + BASE64_CHUNK_SIZE]))
 
-    with open(full_file_name, "r", encoding="utf-8") as f:
-        content = f.read()
+
+def scan_download_markers(content):
+    """Return the offsets of all download markers in content, found in a single pass."""
+    markers = {marker: [] for marker in DOWNLOAD_MARKERS}
+    for match in DOWNLOAD_MARKERS_RE.finditer(content):
+        markers[match.group()].append(match.start())
+    return markers
+
+
+def download_is_current(full_file_name, video_file_name):
+    """Check whether the final editor is newer than everything it is built from."""
+    if os.path.exists(full_file_name + "update"):
+        return False
+    try:
+        final_mtime = os.stat(full_file_name + "final").st_mtime_ns
+        return final_mtime >= max(os.stat(full_file_name).st_mtime_ns, os.stat(video_file_name).st_mtime_ns)
+    except FileNotFoundError:
+        return False
+
+
+def load_download(file_name, user_id):
+    """Apply a pending editor update and return the editor content with its marker offsets."""
+    full_file_name = join(user_dir("out", user_id), file_name + ".html")
+
+    # Work on the raw bytes so the update can be spliced in place instead of rebuilding the string
+    with open(full_file_name, "rb") as f:
+        content = bytearray(f.read())
+    markers = scan_download_markers(content)
 
     update_file = full_file_name + "update"
-    if os.path.exists(update_file):
-        with open(update_file, "r", encoding="utf-8") as f:
+    if os.path.exists(update_file) and markers[NAV_END] and markers[FILE_NAME_VAR]:
+        with open(update_file, "rb") as f:
             new_content = f.read()
-        start_index = content.find("</nav>") + len("</nav>")
-        end_index = content.find("var fileName = ")
-        content = content[:start_index] + new_content + content[end_index:]
+        start_index = markers[NAV_END][0] + len(NAV_END)
+        end_index = markers[FILE_NAME_VAR][0]
+        content[start_index:end_index] = new_content
 
-        with open(full_file_name, "w", encoding="utf-8") as f:
+        with open(full_file_name, "wb") as f:
             f.write(content)
 
         os.remove(update_file)
 
-    content = content.replace(
-        "<div>Bitte den Editor herunterladen, um den Viewer zu erstellen.</div>",
-        '<a href="#" id="viewer-link" onclick="viewerClick()" class="btn btn-primary">Viewer erstellen</a>',
-    )
-    if "var base64str = " not in content:
-        video_file_path = join(out_user_dir, file_name + ".mp4")
-        with open(video_file_path, "rb") as video_file:
-            video_base64 = base64.b64encode(video_file.read()).decode("utf-8")
-
-        video_content = f"""
-var base64str = "{video_base64}";
-var binary = atob(base64str);
-var len = binary.length;
-var buffer = new ArrayBuffer(len);
-var view = new Uint8Array(buffer);
-for (var i = 0; i < len; i++) {{
-    view[i] = binary.charCodeAt(i);
-}}
+        # Only the spliced part needs a new scan, markers behind it just moved
+        shift = len(new_content) - (end_index - start_index)
+        new_markers = scan_download_markers(new_content)
+        for marker, offsets in markers.items():
+            markers[marker] = (
+                [offset for offset in offsets if offset < start_index]
+                + [start_index + offset for offset in new_markers[marker]]
+                + [offset + shift for offset in offsets if offset >= end_index]
+            )
 
-var blob = new Blob([view], {{ type: "video/MP4" }});
-var url = URL.createObjectURL(blob);
+    return content, markers
 
-var video = document.getElementById("player");
 
-setTimeout(function() {{
-  video.pause();
-  video.setAttribute('src', url);
-}}, 100);
-</script>
-"""
-        content = content.replace("</script>", video_content)
+def write_download(out, content, markers, write_video):
+    """Write the offline editor to the binary stream out, write_video(out) adds the video loader."""
+    # Cut points into content: (offset, length, replacement), None stands for the video
+    cuts = [(offset, len(VIEWER_PLACEHOLDER), VIEWER_LINK) for offset in markers[VIEWER_PLACEHOLDER]]
+    if not markers[BASE64_VAR] and markers[SCRIPT_END]:
+        cuts.append((markers[SCRIPT_END][0], len(SCRIPT_END), None))
+    cuts.sort(key=itemgetter(0))
+
+    view = memoryview(content)
+    last = 0
+    for offset, length, replacement in cuts:
+        out.write(view[last:offset])
+        if replacement is None:
+            write_video(out)
+        else:
+            out.write(replacement)
+        last = offset + length
+    out.write(view[last:])
+
+
+def write_embedded_video(video_file_name, out):
+    """Embed the video as base64, so the editor is a single self-contained file."""
+    # Stream the encoded video straight into the output instead of building it in memory
+    out.write(b'\nvar base64str = "')
+    write_base64(video_file_name, out)
+    out.write(VIDEO_LOADER_JS)
 
-    final_file_name = full_file_name + "final"
-    with open(final_file_name, "w", encoding="utf-8") as f:
-        f.write(content)
+
+def write_linked_video(video_name, out):
+    """Load the video from a file next to the editor."""
+    out.write(VIDEO_LINK_JS.replace(b"{src}", quote(video_name).encode()))
+
+
+def prepare_download(file_name, user_id):
+    """Add offline functions to the editor before downloading."""
+    out_user_dir = user_dir("out", user_id)
+    full_file_name = join(out_user_dir, file_name + ".html")
+    video_file_name = join(out_user_dir, file_name + ".mp4")
+
+    # Re-encoding the video is the expensive part, skip it if nothing changed since the last download
+    if download_is_current(full_file_name, video_file_name):
+        return
+
+    content, markers = load_download(file_name, user_id)
+    with open(full_file_name + "final", "wb") as f:
+        write_download(f, content, markers, partial(write_embedded_video, video_file_name))
 
 
 async def download_editor(file_name, user_id):
     """Simplified download function using direct src parameter."""
     try:
         # Ensure output directory exists
-        out_user_dir = join(ROOT, "data", "out", user_id)
+        out_user_dir = user_dir("out", user_id)
         os.makedirs(out_user_dir, exist_ok=True)
         
         # Check if the source HTML file exists
@@ -277,7 +592,7 @@ async def download_editor(file_name, user_id):
             
         # Prepare the final HTML file
         try:
-            prepare_download(file_name, user_id)
+            await asyncio.to_thread(prepare_download, file_name, user_id)
             print(f"Successfully prepared HTML file for download: {file_name}")
         except Exception as prep_error:
             error_msg = f"Error preparing download file: {str(prep_error)}"
@@ -323,7 +638,7 @@ async def download_srt(file_name, user_id):
     """Simplified download function for SRT files using direct src parameter."""
     try:
         # Ensure output directory exists
-        out_user_dir = join(ROOT, "data", "out", user_id)
+        out_user_dir = user_dir("out", user_id)
         os.makedirs(out_user_dir, exist_ok=True)
         
         srt_file = join(out_user_dir, file_name + ".srt")
@@ -363,226 +678,455 @@ async def download_srt(file_name, user_id):
 # We will use NiceGUI's built-in static file serving instead of a custom endpoint
 
 
+class MediaCacheHeaders:
+    """Let the browser reuse fetched video ranges while scrubbing instead of requesting them again.
+
+    A plain ASGI middleware that only touches the response start of /data/ requests, so the streamed
+    Range responses pass through without any per-chunk overhead.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/data/"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cache_control(message):
+            if message["type"] == "http.response.start" and message["status"] in (200, 206):
+                headers = list(message.get("headers", []))
+                if not any(name.lower() == b"cache-control" for name, _ in headers):
+                    headers.append((b"cache-control", MEDIA_CACHE_CONTROL.encode("latin-1")))
+                    message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache_control)
+
+
+def media_redirect(user_id: str, file_name: str):
+    """Hand the video off to the reverse proxy, which serves it with sendfile and Range support."""
+    if user_id.startswith(".") or file_name.startswith("."):
+        raise HTTPException(status_code=404)
+    location = f"{MEDIA_ACCEL_REDIRECT.rstrip('/')}/{quote(user_id)}/{quote(file_name)}"
+    return Response(headers={"X-Accel-Redirect": location})
+
+
+async def editor_save(token: str, request: Request):
+    """Store the content posted by the online editor as the update of its file."""
+    full_file_name = editor_save_tokens.get(token)
+    if full_file_name is None:
+        raise HTTPException(status_code=404)
+    content = (await request.body()).decode("utf-8")
+    await asyncio.to_thread(write_text, full_file_name + "update", content)
+    return Response(status_code=204)
+
+
 async def open_editor(file_name, user_id):
-    out_user_dir = join(ROOT, "data", "out", user_id)
+    out_user_dir = user_dir("out", user_id)
     full_file_name = join(out_user_dir, file_name + ".html")
     with open(full_file_name, "r", encoding="utf-8") as f:
         content = f.read()
 
+    # Point the player at the media route; only the empty src of the player tag needs to change.
     video_path = f"/data/{user_id}/{file_name}.mp4"
-    content = content.replace(
-        '<video id="player" width="100%" style="max-height: 320px" src="" type="video/MP4" controls="controls" position="sticky"></video>',
-        f'<video id="player" width="100%" style="max-height: 320px" src="{video_path}" type="video/MP4" controls="controls" position="sticky"></video>',
-    )
-    content = content.replace(
-        '<video id="player" width="100%" style="max-height: 250px" src="" type="video/MP4" controls="controls" position="sticky"></video>',
-        f'<video id="player" width="100%" style="max-height: 250px" src="{video_path}" type="video/MP4" controls="controls" position="sticky"></video>',
-    )
-
-    user_storage[user_id]["content"] = content
+    player_index = content.find('<video id="player"')
+    src_index = content.find('src=""', player_index) if player_index != -1 else -1
+    if src_index != -1:
+        content = content[:src_index] + f'src="{video_path}"' + content[src_index + len('src=""') :]
+
+    user_state(user_id)["content"] = content
     user_storage[user_id]["full_file_name"] = full_file_name
     ui.open(editor, new_tab=True)
 
 
+def create_zip(zip_file_path, file_list, user_id):
+    """Write the editor of every transcribed file into a zip archive, next to its video."""
+    out_dir = user_dir("out", user_id)
+    file_names = [file_status[0] for file_status in file_list if file_status[2] == 100.0]
+    # The updates are applied in parallel, while the zip is written in order as the files become ready.
+    # The videos go into the zip as they are, so they are neither base64-encoded nor inflated by a third.
+    with ThreadPoolExecutor(max_workers=4) as executor, zipfile.ZipFile(
+        zip_file_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True, strict_timestamps=False
+    ) as myzip:
+        futures = [executor.submit(load_download, file_name, user_id) for file_name in file_names]
+        for file_name, future in zip(file_names, futures):
+            content, markers = future.result()
+            video_name = file_name + ".mp4"
+            with myzip.open(file_name + ".html", "w", force_zip64=True) as out:
+                write_download(out, content, markers, partial(write_linked_video, video_name))
+            video_file_name = join(out_dir, video_name)
+            if os.path.exists(video_file_name):
+                myzip.write(video_file_name, arcname=video_name)
+            print(f"Added to zip: {file_name}.html")
+
+
 async def download_all(user_id):
     """Simple download function for all files - matches original implementation style."""
     # Ensure output directory exists
-    out_dir = join(ROOT, "data", "out", user_id)
+    out_dir = user_dir("out", user_id)
     os.makedirs(out_dir, exist_ok=True)
     
     # Use a fixed filename as in the original implementation
     zip_file_path = join(out_dir, "transcribed_files.zip")
     
-    # Create the zip file with all completed files
-    with zipfile.ZipFile(zip_file_path, "w", allowZip64=True) as myzip:
-        for file_status in user_storage[user_id]["file_list"]:
-            if file_status[2] == 100.0:
-                prepare_download(file_status[0], user_id)
-                final_html = join(out_dir, file_status[0] + ".htmlfinal")
-                if os.path.exists(final_html):
-                    myzip.write(final_html, arcname=file_status[0] + ".html")
-                    print(f"Added to zip: {file_status[0]}.html")
-    
-    # Download using the simplest form - exactly like the original code
-    ui.download(zip_file_path)
+    # Create the zip file in a worker thread so the event loop keeps serving other clients
+    await asyncio.to_thread(create_zip, zip_file_path, user_state(user_id)["file_list"], user_id)
+
+    # A file path makes ui.download serve a FileResponse, so the zip is streamed and never read in Python
+    ui.download(src=zip_file_path, filename="transcribed_files.zip")
 
 
-def delete_file(file_name, user_id, refresh_file_view):
+def remove_file(path):
+    """Remove path if it exists; a single unlink instead of exists() + remove()."""
+    try:
+        os.remove(path)
+        print(f"Deleted file: {path}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Failed to delete {path}: {str(e)}")
+
+
+async def delete_file(file_name, user_id, refresh_file_view):
+    in_path = user_dir("in", user_id)
+    error_path = user_dir("error", user_id)
+    out_path = user_dir("out", user_id)
     paths_to_delete = [
-        join(ROOT, "data", "in", user_id, file_name),
-        join(ROOT, "data", "error", user_id, file_name),
-        join(ROOT, "data", "error", user_id, file_name + ".txt"),
+        join(in_path, file_name),
+        join(error_path, file_name),
+        join(error_path, file_name + ".txt"),
     ]
-    suffixes = ["", ".txt", ".html", ".mp4", ".srt", ".htmlupdate", ".htmlfinal"]
+    suffixes = ["", ".txt", ".html", ".mp4", ".srt", ".htmlupdate", ".htmlfinal", EDITOR_PAGE_SUFFIX]
     for suffix in suffixes:
-        paths_to_delete.append(join(ROOT, "data", "out", user_id, file_name + suffix))
+        paths_to_delete.append(join(out_path, file_name + suffix))
 
     # Also delete any processing marker files
-    processing_marker = join(ROOT, "data", "in", user_id, file_name + ".processing")
+    processing_marker = join(in_path, file_name + ".processing")
     paths_to_delete.append(processing_marker)
     
-    # Try to delete all the paths
-    for path in paths_to_delete:
-        if os.path.exists(path):
-            try:
-                os.remove(path)
-                print(f"Deleted file: {path}")
-            except Exception as e:
-                print(f"Failed to delete {path}: {str(e)}")
+    # Delete worker progress files that might be related to this file, found in the snapshot listen already keeps
+    worker_user_dir = user_dir("worker", user_id)
+    for f in dir_snapshot(worker_user_dir):
+        if f.endswith(f"_{file_name}"):
+            paths_to_delete.append(join(worker_user_dir, f))
 
-    # Delete worker progress files that might be related to this file
-    worker_user_dir = join(ROOT, "data", "worker", user_id)
-    if os.path.exists(worker_user_dir):
-        for f in os.listdir(worker_user_dir):
-            if f.endswith(f"_{file_name}"):
-                try:
-                    os.remove(join(worker_user_dir, f))
-                    print(f"Deleted worker file: {join(worker_user_dir, f)}")
-                except Exception as e:
-                    print(f"Failed to delete worker file {join(worker_user_dir, f)}: {str(e)}")
+    # Delete all the paths in threads, overlapping the unlink latency on network file systems
+    # without blocking the event loop for the other clients
+    await asyncio.gather(*(asyncio.to_thread(remove_file, path) for path in paths_to_delete))
 
     refresh_file_view(user_id=user_id, refresh_queue=True, refresh_results=True)
+    notify_file_view(user_id)
     ui.notify(f"Datei '{file_name}' wurde entfernt")
 
 
+def listen_signature(user_id):
+    """Modification times of all directories that influence the file view of a user."""
+    signature = []
+    for path in (
+        user_dir("in", user_id),
+        user_dir("out", user_id),
+        user_dir("error", user_id),
+        user_dir("worker", user_id),
+        join(ROOT, "data", "worker"),
+    ):
+        try:
+            signature.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def parse_worker_file(f):
+    """Split a worker progress file name into (estimated_time, start, file_name), or None if it isn't one."""
+    if f not in worker_file_parts:
+        if len(worker_file_parts) >= MAX_WORKER_FILE_PARTS:
+            worker_file_parts.clear()
+        parts = f.split("_", 2)
+        try:
+            worker_file_parts[f] = (float(parts[0]), float(parts[1]), parts[2]) if len(parts) == 3 else None
+        except ValueError:
+            worker_file_parts[f] = None
+    return worker_file_parts[f]
+
+
 def listen(user_id, refresh_file_view):
     """Periodically check if a file is being transcribed and calculate its estimated progress."""
-    worker_user_dir = join(ROOT, "data", "worker", user_id)
-    
+    worker_user_dir = user_dir("worker", user_id)
+    state = user_state(user_id)
+
     if os.path.exists(worker_user_dir):
-        worker_files = listdir(worker_user_dir)
-        
-        for f in worker_files:
+        # Both listings come from the cached scandir snapshots instead of per-file stat calls
+        in_entries = dir_snapshot(user_dir("in", user_id))
+
+        for f, (is_file, _) in dir_snapshot(worker_user_dir).items():
             file_path = join(worker_user_dir, f)
             
-            if isfile(file_path):
-                parts = f.split("_")
-                if len(parts) < 3:
+            if is_file:
+                parsed = parse_worker_file(f)
+                if parsed is None:
                     continue
-                    
-                estimated_time = float(parts[0])
-                start = float(parts[1])
-                file_name = "_".join(parts[2:])
+
+                estimated_time, start, file_name = parsed
                 progress = min(0.975, (time.time() - start) / estimated_time)
                 estimated_time_left = round(max(1, estimated_time - (time.time() - start)))
 
-                in_file = join(ROOT, "data", "in", user_id, file_name)
-                if os.path.exists(in_file):
+                in_entry = in_entries.get(file_name)
+                if in_entry is not None:
                     # Show different message for post-processing phase vs normal transcription
                     if progress > 0.95:
                         status_message = f"Position 1/1 in der Warteschlange. Datei wird nachbearbeitet... (SRT-Datei wird erzeugt, Editor wird erstellt)"
                     else:
                         status_message = f"Position 1/1 in der Warteschlange. Datei wird transkribiert. Geschätzte Bearbeitungszeit: {datetime.timedelta(seconds=estimated_time_left)}"
                     
-                    user_storage[user_id]["updates"] = [
+                    state["updates"] = [
                         file_name,
                         status_message,
                         progress * 100,
                         estimated_time_left,
-                        os.path.getmtime(in_file),
+                        in_entry[1],
                     ]
                     
                     # Persist the updates to the file_list
-                    updated = False
-                    for i, file_status in enumerate(user_storage[user_id]["file_list"]):
-                        if file_status[0] == file_name:
-                            user_storage[user_id]["file_list"][i] = user_storage[user_id]["updates"]
-                            updated = True
-                            break
+                    i = state.get("file_index", {}).get(file_name)
+                    if i is not None:
+                        state["file_list"][i] = state["updates"]
                 else:
                     os.remove(file_path)
                     
                 refresh_file_view(
                     user_id=user_id,
                     refresh_queue=True,
-                    refresh_results=(user_storage[user_id].get("file_in_progress") != file_name),
+                    refresh_results=(state.get("file_in_progress") != file_name),
                 )
-                user_storage[user_id]["file_in_progress"] = file_name
+                state["file_in_progress"] = file_name
                 return
 
         # No files being processed
-        if user_storage[user_id].get("updates"):
-            user_storage[user_id]["updates"] = []
-            user_storage[user_id]["file_in_progress"] = None
+        if state.get("updates"):
+            state["updates"] = []
+            state["file_in_progress"] = None
             refresh_file_view(user_id=user_id, refresh_queue=True, refresh_results=True)
         else:
             refresh_file_view(user_id=user_id, refresh_queue=True, refresh_results=False)
 
 
-def update_hotwords(user_id):
-    if "textarea" in user_storage[user_id]:
-        app.storage.user[f"{user_id}_vocab"] = user_storage[user_id]["textarea"].value
+def notify_file_view(user_id):
+    """Wake all open pages of a user so they refresh their file view."""
+    file_view_versions[user_id] = file_view_versions.get(user_id, 0) + 1
+    for event in file_view_events.get(user_id, ()):
+        event.set()
 
 
-def update_language(user_id):
-    if "language" in user_storage[user_id]:
-        app.storage.user[f"{user_id}_language"] = INVERTED_LANGUAGES[user_storage[user_id]["language"].value]
+def check_data_dirs(signatures):
+    """Wake the pages of every connected user whose directories changed since the last check."""
+    for user_id in list(file_view_events):
+        signature = listen_signature(user_id)
+        if signatures.get(user_id) != signature:
+            signatures[user_id] = signature
+            notify_file_view(user_id)
 
 
-@ui.page("/editor")
-async def editor():
-    """Prepare and open the editor for online editing."""
+async def watch_data_dirs():
+    """Check the directories of all connected users whenever something changes under data/.
 
-    async def handle_save(full_file_name):
-        content = ""
-        for i in range(100):
-            content_chunk = await ui.run_javascript(
-                f"""
-var content = String(document.documentElement.innerHTML);
-var start_index = content.indexOf('<!--start-->') + '<!--start-->'.length;
-content = content.slice(start_index, content.indexOf('var fileName = ', start_index))
-content = content.slice(content.indexOf('</nav>') + '</nav>'.length, content.length)
-return content.slice({i * 500_000}, {(i + 1) * 500_000});
-""",
-                timeout=60.0,
-            )
-            content += content_chunk
-            if len(content_chunk) < 500_000:
+    File system events come from watchfiles (inotify on Linux). Events of other hosts on a network
+    file system are not reported, so the directories are also checked every DATA_DIR_FALLBACK_POLL
+    seconds. Without watchfiles, they are polled once per second.
+    """
+    signatures = {}
+    data_dir = join(ROOT, "data")
+    if awatch is not None and os.path.isdir(data_dir):
+        try:
+            async for _ in awatch(
+                data_dir,
+                watch_filter=None,
+                debounce=200,
+                rust_timeout=DATA_DIR_FALLBACK_POLL * 1000,
+                yield_on_timeout=True,
+            ):
+                check_data_dirs(signatures)
+        except Exception as e:
+            print(f"Watching {data_dir} failed, polling instead: {str(e)}")
+    while True:
+        check_data_dirs(signatures)
+        await asyncio.sleep(1)
+
+
+async def follow_file_view(client, user_id, refresh_file_view, flush_file_view, page_state):
+    """Run listen() when woken by watch_data_dirs, every second while a file is transcribed, else as a fallback.
+
+    Refreshes requested through refresh_file_view are applied here too, so all requests made
+    before the task runs again share a single flush_file_view call.
+    While the browser tab is hidden, refreshes are throttled to one every HIDDEN_PAGE_INTERVAL seconds.
+    """
+    event = page_state["event"]
+    file_view_events.setdefault(user_id, set()).add(event)
+    seen_version = None
+    last_refresh = 0
+    try:
+        while client.id in Client.instances:
+            in_progress = bool(user_storage.get(user_id, {}).get("updates"))
+            if page_state["hidden"]:
+                interval = HIDDEN_PAGE_INTERVAL
+            elif in_progress:
+                interval = 1
+            else:
+                interval = LISTEN_MAX_IDLE
+            try:
+                await asyncio.wait_for(event.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            event.clear()
+            if client.id not in Client.instances or user_id not in user_storage:
                 break
+            # Coalesce: skip the refresh if nothing changed since the last one, unless progress is moving.
+            # Other users' uploads don't touch our directories, so refresh at least every LISTEN_MAX_IDLE seconds.
+            version = file_view_versions.get(user_id, 0)
+            now = time.monotonic()
+            requested = page_state["refresh_queue"] or page_state["refresh_results"]
+            if not requested:
+                if page_state["hidden"] and now - last_refresh < HIDDEN_PAGE_INTERVAL:
+                    continue
+                if version == seen_version and not in_progress and now - last_refresh < LISTEN_MAX_IDLE:
+                    continue
+            seen_version = version
+            last_refresh = now
+            try:
+                listen(user_id, refresh_file_view)
+                flush_file_view(user_id)
+            except Exception as e:
+                print(f"Error refreshing file view: {str(e)}")
+            # The refresh requested by listen() above is done, it must not wake the loop again
+            event.clear()
+    finally:
+        events_of_user = file_view_events.get(user_id, set())
+        events_of_user.discard(event)
+        if not events_of_user:
+            # No page of this user is open anymore, so its state may be evicted
+            file_view_events.pop(user_id, None)
+
+
+def set_page_hidden(page_state, hidden):
+    """Track the visibility of the browser tab; refresh right away when it becomes visible again."""
+    page_state["hidden"] = hidden
+    if not hidden:
+        page_state["event"].set()
+
+
+def update_hotwords(user_id, e: events.ValueChangeEventArguments):
+    """Persist the vocabulary once typing pauses instead of writing the user storage on every keystroke."""
+    pending = user_state(user_id).get("hotwords_save")
+    if pending:
+        pending[0].cancel()
+    handle = asyncio.get_running_loop().call_later(HOTWORDS_SAVE_DELAY, store_hotwords, app.storage.user, user_id, e.value)
+    user_storage[user_id]["hotwords_save"] = (handle, e.value)
+
+
+def store_hotwords(storage, user_id, value):
+    storage[f"{user_id}_vocab"] = value
+    user_storage.get(user_id, {}).pop("hotwords_save", None)
+
+
+def flush_hotwords(user_id):
+    """Write a vocabulary change that is still waiting for its debounced save."""
+    pending = user_state(user_id).pop("hotwords_save", None)
+    if pending:
+        pending[0].cancel()
+        app.storage.user[f"{user_id}_vocab"] = pending[1]
 
-        update_file = full_file_name + "update"
-        with open(update_file, "w", encoding="utf-8") as f:
-            f.write(content.strip())
 
+def update_language(user_id, e: events.ValueChangeEventArguments):
+    app.storage.user[f"{user_id}_language"] = INVERTED_LANGUAGES[e.value]
+
+
+def editor_content(full_file_name, content):
+    """Merge the saved update into the editor content opened by open_editor; also tell whether it was rebuilt.
+
+    Reloads of an editor reuse the merged content as long as open_editor wasn't called again
+    (content is the same object) and the update file is unchanged.
+    """
+    update_file = full_file_name + "update"
+    try:
+        update_mtime = os.stat(update_file).st_mtime_ns
+    except FileNotFoundError:
+        update_mtime = None
+    cached = editor_pages.get(full_file_name)
+    if cached and cached[0] is content and cached[1] == update_mtime:
+        editor_pages.move_to_end(full_file_name)
+        return cached[2], False
+
+    base = content
+    if update_mtime is not None:
+        with open(update_file, "r", encoding="utf-8") as f:
+            new_content = f.read()
+        # The navbar comes first, so the search for the script variable can start behind it
+        start_index = content.find("</nav>") + len("</nav>")
+        end_index = content.find("var fileName = ", start_index)
+        content = content[:start_index] + new_content + content[end_index:]
+    content = EDITOR_VIEWER_LINK_RE.sub(EDITOR_VIEWER_PLACEHOLDER, content)
+
+    editor_pages[full_file_name] = (base, update_mtime, content)
+    editor_pages.move_to_end(full_file_name)
+    while len(editor_pages) > MAX_EDITOR_PAGES:
+        editor_pages.popitem(last=False)
+    return content, True
+
+
+@ui.page("/editor")
+async def editor():
+    """Prepare and open the editor for online editing."""
+
+    def handle_saved(e: events.GenericEventArguments):
         ui.notify("Änderungen gespeichert.")
 
+    def handle_save_failed(e: events.GenericEventArguments):
+        ui.notify("Änderungen konnten nicht gespeichert werden.", color="negative")
+
     user_id = str(app.storage.browser.get("id", "local")) if ONLINE else "local"
 
-    out_user_dir = join(ROOT, "data", "out", user_id)
-    app.add_media_files(f"/data/{user_id}", out_user_dir)
     user_data = user_storage.get(user_id, {})
     full_file_name = user_data.get("full_file_name")
 
     if full_file_name:
-        ui.on("editor_save", lambda e: handle_save(full_file_name))
-        ui.add_body_html("<!--start-->")
-
-        content = user_data.get("content", "")
-        update_file = full_file_name + "update"
-        if os.path.exists(update_file):
-            with open(update_file, "r", encoding="utf-8") as f:
-                new_content = f.read()
-            start_index = content.find("</nav>") + len("</nav>")
-            end_index = content.find("var fileName = ")
-            content = content[:start_index] + new_content + content[end_index:]
-
-        content = content.replace(
-            '<a href ="#" id="viewer-link" onClick="viewerClick()" class="btn btn-primary">Viewer erstellen</a>',
-            "<div>Bitte den Editor herunterladen, um den Viewer zu erstellen.</div>",
-        )
-        content = content.replace(
-            '<a href="#" id="viewer-link" onclick="viewerClick()" class="btn btn-primary">Viewer erstellen</a>',
-            "<div>Bitte den Editor herunterladen, um den Viewer zu erstellen.</div>",
-        )
-        ui.add_body_html(content)
-
+        # The page posts its content once to editor_save, the token stands for the file it may write
+        token = secrets.token_urlsafe(16)
+        while len(editor_save_tokens) >= MAX_EDITOR_SAVE_TOKENS:
+            editor_save_tokens.popitem(last=False)
+        editor_save_tokens[token] = full_file_name
+        ui.on("editor_saved", handle_saved)
+        ui.on("editor_save_failed", handle_save_failed)
+        # The editor is served as a file through the media route and shown in an iframe, so the
+        # browser fetches it over plain HTTP instead of receiving megabytes through the websocket
+        content, rebuilt = editor_content(full_file_name, user_data.get("content", ""))
+        page_file = full_file_name[: -len(".html")] + EDITOR_PAGE_SUFFIX
+        if rebuilt or not os.path.exists(page_file):
+            await asyncio.to_thread(write_text, page_file, content)
+        version = os.stat(page_file).st_mtime_ns
+        page_url = f"/data/{quote(user_id)}/{quote(basename(page_file))}?v={version}"
+        ui.html(f'<iframe id="editor-frame" src="{page_url}" style="{EDITOR_FRAME_STYLE}"></iframe>').classes("w-full")
+
+        # Load events don't bubble, but can be caught while capturing; the iframe is created after this script runs
         ui.add_body_html(
             """
 <script language="javascript">
-    var origFunction = downloadClick;
-    downloadClick = function downloadClick() {
-        emitEvent('editor_save');
+document.addEventListener("load", function(event) {
+    if (event.target.id !== "editor-frame") {
+        return;
     }
+    var doc = event.target.contentDocument;
+    event.target.contentWindow.downloadClick = function downloadClick() {"""
+            + EDITOR_CONTENT_JS
+            + f"""
+        fetch("/api/editor_save/{token}", {{
+            method: "POST",
+            headers: {{"Content-Type": "text/plain;charset=utf-8"}},
+            body: content.trim(),
+        }})
+            .then(function(response) {{ emitEvent(response.ok ? "editor_saved" : "editor_save_failed"); }})
+            .catch(function() {{ emitEvent("editor_save_failed"); }});
+    }};
+}}, true);
 </script>
 """
         )
@@ -623,7 +1167,7 @@ def inspect_docker_container(user_id):
                     result += f"Error listing files in worker directory: {str(e)}\n"
         
         # Check if input files exist
-        in_dir = join(ROOT, "data", "in", user_id)
+        in_dir = user_dir("in", user_id)
         if os.path.exists(in_dir):
             try:
                 files = [f for f in listdir(in_dir) if isfile(join(in_dir, f)) 
@@ -641,46 +1185,80 @@ def inspect_docker_container(user_id):
         return f"Error in diagnostic function: {str(e)}"
 
 
+async def remove_tmp_dir(path):
+    try:
+        await asyncio.to_thread(shutil.rmtree, path, True)
+    finally:
+        tmp_dir_removals.discard(path)
+
+
 @ui.page("/")
-async def main_page():
+async def main_page(client: Client):
     """Main page of the application."""
 
+    # Label and progress bar of each queued file, so progress updates don't rebuild the queue
+    queue_rows = {}
+
+    page_state = {"hidden": False, "event": asyncio.Event(), "refresh_queue": False, "refresh_results": False}
+
     def refresh_file_view(user_id, refresh_queue, refresh_results):
-        num_errors = len(user_storage[user_id]["known_errors"])
+        """Request a refresh, follow_file_view applies all pending requests at once."""
+        page_state["refresh_queue"] |= refresh_queue
+        page_state["refresh_results"] |= refresh_results
+        page_state["event"].set()
+
+    def flush_file_view(user_id):
+        refresh_queue, refresh_results = page_state["refresh_queue"], page_state["refresh_results"]
+        page_state["refresh_queue"] = page_state["refresh_results"] = False
+        num_errors = len(user_state(user_id)["known_errors"])
         read_files(user_id)
         if refresh_queue:
-            display_queue.refresh(user_id=user_id)
+            update_queue(user_id)
         if refresh_results or num_errors < len(user_storage[user_id]["known_errors"]):
             display_results.refresh(user_id=user_id)
 
+    def update_queue(user_id):
+        """Update the queue rows in place while the same files are queued, else rebuild the queue."""
+        queue_items = user_storage[user_id]["queue_items"]
+        if [file_status[0] for file_status in queue_items] != list(queue_rows):
+            display_queue.refresh(user_id=user_id)
+            return
+        # Only changed labels and values are sent to the browser
+        for file_status in queue_items:
+            label, progress = queue_rows[file_status[0]]
+            label.set_content(queue_label(file_status))
+            progress.set_value(file_status[2] / 100)
+
     @ui.refreshable
     def display_queue(user_id):
-        for file_status in sorted(user_storage[user_id]["file_list"], key=lambda x: (x[2], -x[4], x[0])):
-            if user_storage[user_id].get("updates") and user_storage[user_id]["updates"][0] == file_status[0]:
-                file_status = user_storage[user_id]["updates"]
-            if 0 <= file_status[2] < 100.0:
-                ui.markdown(f"<b>{file_status[0].replace('_', BACKSLASHCHAR + '_')}:</b> {file_status[1]}")
-                ui.button(
-                    "Abbrechen",
-                    on_click=partial(
-                        delete_file,
-                        file_name=file_status[0],
-                        user_id=user_id,
-                        refresh_file_view=refresh_file_view,
-                    ),
-                    color="red-5",
-                ).props("no-caps")
-                ui.linear_progress(value=file_status[2] / 100, show_value=False, size="10px").props("instant-feedback")
-                ui.separator()
+        queue_rows.clear()
+        for file_status in user_storage[user_id]["queue_items"]:
+            label = ui.markdown(queue_label(file_status))
+            ui.button(
+                "Abbrechen",
+                on_click=partial(
+                    delete_file,
+                    file_name=file_status[0],
+                    user_id=user_id,
+                    refresh_file_view=refresh_file_view,
+                ),
+                color="red-5",
+            ).props("no-caps")
+            progress = ui.linear_progress(value=file_status[2] / 100, show_value=False, size="10px").props(
+                "instant-feedback"
+            )
+            queue_rows[file_status[0]] = (label, progress)
+            ui.separator()
 
     @ui.refreshable
     def display_results(user_id):
         any_file_ready = False
-        for file_status in sorted(user_storage[user_id]["file_list"], key=lambda x: (x[2], -x[4], x[0])):
-            if user_storage[user_id].get("updates") and user_storage[user_id]["updates"][0] == file_status[0]:
-                file_status = user_storage[user_id]["updates"]
+        # One cached listing of the output directory instead of two stats per file for the summaries
+        out_entries = dir_snapshot(user_dir("out", user_id)) if SUMMARIZATION else {}
+        # Errors sort before finished files, as in the combined list.
+        for file_status in user_storage[user_id]["error_items"] + user_storage[user_id]["result_items"]:
             if file_status[2] >= 100.0:
-                ui.markdown(f"<b>{file_status[0].replace('_', BACKSLASHCHAR + '_')}</b>")
+                ui.markdown(f"<b>{display_name(file_status[0])}</b>")
                 with ui.row():
                     ui.button(
                         "Editor herunterladen (Lokal)",
@@ -724,27 +1302,15 @@ async def main_page():
                         ).props("no-caps")
                         summary_download.disable()
 
-                        if os.path.isfile(
-                            join(
-                                ROOT + "data/out",
-                                user_id,
-                                file_status[0] + ".htmlsummary",
-                            )
-                        ):
+                        if out_entries.get(file_status[0] + ".htmlsummary", (False,))[0]:
                             summary_download.enable()
-                        if not os.path.isfile(
-                            join(
-                                ROOT + "data/out",
-                                user_id,
-                                file_status[0] + ".todosummary",
-                            )
-                        ):
+                        if not out_entries.get(file_status[0] + ".todosummary", (False,))[0]:
                             summary_create.enable()
                         else:
                             ui.label("in Bearbeitung")
                 ui.separator()
             elif file_status[2] == -1:
-                ui.markdown(f"<b>{file_status[0].replace('_', BACKSLASHCHAR + '_')}:</b> {file_status[1]}")
+                ui.markdown(f"<b>{display_name(file_status[0])}:</b> {file_status[1]}")
                 ui.button(
                     "Datei entfernen",
                     on_click=partial(
@@ -773,18 +1339,17 @@ async def main_page():
     else:
         user_id = "local"
 
-    user_storage[user_id] = {
-        "uploaded_files": set(),
-        "file_list": [],
-        "content": "",
-        "content_filename": "",
-        "file_in_progress": None,
-        "known_errors": set(),
-    }
+    # Bound the number of users kept in memory; the least recently opened ones are dropped first.
+    # A returning user keeps their state, which other open tabs and listen() are still using.
+    user_state(user_id)
+    user_storage.move_to_end(user_id)
+    evict_users(keep=user_id)
 
-    in_user_tmp_dir = join(ROOT, "data", "in", user_id, "tmp")
-    if os.path.exists(in_user_tmp_dir):
-        shutil.rmtree(in_user_tmp_dir)
+    # Remove leftovers in the background; tabs opened at the same time share one removal
+    in_user_tmp_dir = join(user_dir("in", user_id), "tmp")
+    if in_user_tmp_dir not in tmp_dir_removals and os.path.exists(in_user_tmp_dir):
+        tmp_dir_removals.add(in_user_tmp_dir)
+        background_tasks.create(remove_tmp_dir(in_user_tmp_dir))
 
     read_files(user_id)
 
@@ -805,7 +1370,8 @@ async def main_page():
                                 max_file_size=12_000_000_000,
                                 max_files=100,
                             )
-                            .props('accept="video/*, audio/*, .zip"')
+                            # batch: upload all selected files in one request instead of one request per file
+                            .props('accept="video/*, audio/*, .zip" batch')
                             .tooltip("Dateien auswählen")
                             .classes("w-full")
                             .style("width: 100%;")
@@ -822,14 +1388,19 @@ async def main_page():
 
                 ui.label("")
                 
-                # Quick timer for checking file progress
-                ui.timer(
-                    1,  # Check frequently for better responsiveness
-                    partial(listen, user_id=user_id, refresh_file_view=refresh_file_view),
+                # Refresh the file view whenever the directory watcher reports a change
+                background_tasks.create(
+                    follow_file_view(client, user_id, refresh_file_view, flush_file_view, page_state)
+                )
+                ui.on("page_hidden", partial(set_page_hidden, page_state, True))
+                ui.on("page_visible", partial(set_page_hidden, page_state, False))
+                ui.add_body_html(
+                    "<script>document.addEventListener('visibilitychange', "
+                    "() => emitEvent(document.hidden ? 'page_hidden' : 'page_visible'));</script>"
                 )
-                user_storage[user_id]["language"] = ui.select(
-                    [LANGUAGES[key] for key in LANGUAGES],
-                    value="deutsch",
+                ui.select(
+                    LANGUAGE_OPTIONS,
+                    value=LANGUAGES.get(app.storage.user.get(f"{user_id}_language", "de"), DEFAULT_LANGUAGE),
                     on_change=partial(update_language, user_id),
                     label="Gesprochene Sprache",
                 ).style("width: min(40vw, 400px)")
@@ -838,14 +1409,14 @@ async def main_page():
                     .classes("w-full no-wrap")
                     .style("width: min(40vw, 400px)") as expansion
                 ):
-                    user_storage[user_id]["textarea"] = ui.textarea(
+                    textarea = ui.textarea(
                         label="Vokabular",
                         placeholder="Zürich\nUster\nUitikon",
                         on_change=partial(update_hotwords, user_id),
                     ).classes("w-full h-full")
                     hotwords = app.storage.user.get(f"{user_id}_vocab", "").strip()
                     if hotwords:
-                        user_storage[user_id]["textarea"].value = hotwords
+                        textarea.value = hotwords
                         expansion.open()
                 with (
                     ui.expansion("Informationen", icon="help_outline")
@@ -855,17 +1426,34 @@ async def main_page():
                     ui.label("Diese Prototyp-Applikation wurde vom Statistischen Amt & Amt für Informatik Kanton Zürich entwickelt.")
                 ui.button(
                     "Anleitung öffnen",
-                    on_click=lambda: ui.open(help_page, new_tab=True),
+                    on_click=partial(ui.open, help_page, new_tab=True),
                 ).props("no-caps")
 
             display_files(user_id=user_id)
 
 
 if __name__ in {"__main__", "__mp_main__"}:
+    # Validate the cookie secret once at startup instead of failing on the first storage access
+    if not STORAGE_SECRET:
+        raise ValueError("STORAGE_SECRET is not set. Please check your .env file.")
+    if ONLINE and (len(STORAGE_SECRET) < 32 or STORAGE_SECRET == "this is my secret"):
+        print("WARNING: STORAGE_SECRET is weak. Use a random value of at least 32 characters in production.")
+
     # Create all required directories at startup
     for directory in ['data/in', 'data/out', 'data/worker', 'data/error']:
         os.makedirs(join(ROOT, directory), exist_ok=True)
-    
+
+    # A single watcher polls the data directories for all pages instead of one timer per page
+    app.on_startup(watch_data_dirs)
+
+    # Serve the videos of all users under /data/<user_id>/ with a single route
+    if MEDIA_ACCEL_REDIRECT:
+        app.add_api_route("/data/{user_id}/{file_name}", media_redirect)
+    else:
+        app.add_media_files("/data", join(ROOT, "data", "out"))
+    app.add_middleware(MediaCacheHeaders)
+    app.add_api_route("/api/editor_save/{token}", editor_save, methods=["POST"])
+
     if ONLINE:
         ui.run(
             port=8080,
@@ -29,10 +29,12 @@ PROCESSING_FILE_SIZE = Gauge('processing_file_size_bytes', 'Size of the file cur
 def track_file_processed(file_path):
     """Track file being processed"""
     FILE_COUNT.inc()
-    if os.path.exists(file_path):
-        file_size = os.path.getsize(file_path)
-        FILE_SIZE.observe(file_size)
-        PROCESSING_FILE_SIZE.set(file_size)
+    try:
+        file_size = os.stat(file_path).st_size
+    except FileNotFoundError:
+        return
+    FILE_SIZE.observe(file_size)
+    PROCESSING_FILE_SIZE.set(file_size)
     
 def track_queue_size(queue_length):
     """Update the queue size metric"""
@@ -1,45 +1,99 @@
 import os
+import re
 import torch
 import pandas as pd
 import time
 import subprocess
+import wave
 import numpy as np
 import whisperx
-from whisperx.audio import SAMPLE_RATE, log_mel_spectrogram, N_SAMPLES
+from whisperx.audio import SAMPLE_RATE, log_mel_spectrogram, mel_filters, N_SAMPLES, N_FFT, HOP_LENGTH, N_FRAMES
 from dataclasses import replace
 
-# Keep transformers import as it's needed for PyAnnote
-from transformers import pipeline
 
-def custom_ffmpeg_read(file_path, sampling_rate):
-    """Read audio file using ffmpeg with video stream removal."""
+def read_pcm_wav(file_path, sampling_rate):
+    """Return the samples of a 16-bit mono WAV at the target rate, or None if ffmpeg is needed."""
+    try:
+        with wave.open(file_path, "rb") as w:
+            if w.getframerate() != sampling_rate or w.getnchannels() != 1 or w.getsampwidth() != 2:
+                return None
+            frames = w.readframes(w.getnframes())
+    except (wave.Error, EOFError, OSError):
+        return None
+    # Same scaling ffmpeg applies when converting s16 to f32le
+    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def custom_ffmpeg_read(file_path, sampling_rate, audio_filter=None, duration=None):
+    """Read audio file using ffmpeg with video stream removal, optionally applying an -af filter.
+
+    duration (seconds), if the caller already probed it, sizes the sample buffer up front.
+    """
+    if audio_filter is None:
+        audio = read_pcm_wav(file_path, sampling_rate)
+        if audio is not None and audio.shape[0] > 0:
+            return audio
+
     ffmpeg_command = [
         "ffmpeg", "-i", file_path,
         "-vn",  # Explicitly ignore video streams
+        *(["-af", audio_filter] if audio_filter else []),
         "-ac", "1", "-ar", str(sampling_rate),
         "-f", "f32le", "-hide_banner", "-loglevel", "quiet",
         "pipe:1"
     ]
     
+    # Read the samples straight into a writable array instead of bytes followed by a copy. The buffer
+    # is sized from the known duration (plus a second of slack), or grown on demand without a probe.
+    if duration:
+        n_samples = int(duration * sampling_rate) + sampling_rate
+    else:
+        n_samples = 60 * sampling_rate
+
     try:
         with subprocess.Popen(ffmpeg_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
-            stdout, stderr = proc.communicate()
+            audio = np.empty(n_samples, dtype=np.float32)
+            written = 0
+            while True:
+                if written == audio.nbytes:
+                    audio = np.concatenate((audio, np.empty_like(audio)))
+                buffer = memoryview(audio).cast("B")
+                n = proc.stdout.readinto(buffer[written:])
+                buffer.release()
+                if not n:
+                    break
+                written += n
+            stderr = proc.stderr.read()
+            proc.wait()
             if proc.returncode != 0:
                 raise ValueError(f"FFmpeg error: {stderr.decode('utf-8')}")
-            
-            # Convert to numpy array
-            audio = np.frombuffer(stdout, dtype=np.float32)
+
+            audio = audio[: written // 4]
             if audio.shape[0] == 0:
                 raise ValueError("No audio stream found in file or file is not a valid audio format")
-            # Return a copy to ensure the array is writable (fixes PyTorch tensor conversion warnings)
-            return audio.copy()
+            return audio
     except Exception as e:
         raise ValueError(f"Error reading audio file: {str(e)}")
 
-
 from data.const import data_leaks
 
+# One alternation per language, longest phrase first so it wins over phrases it contains
+DATA_LEAK_PATTERNS = {
+    lang: re.compile("|".join(map(re.escape, sorted(lines, key=len, reverse=True))))
+    for lang, lines in data_leaks.items()
+}
+
 DEVICE = os.getenv("DEVICE")
+# Share of device memory the CUDA caching allocator may hold before it is handed back to the driver
+GPU_CACHE_PRESSURE = 0.9
+
+
+def release_gpu_cache():
+    """Empty the CUDA cache only under memory pressure, keeping it warm between files."""
+    if torch.cuda.is_available():
+        total = torch.cuda.get_device_properties(0).total_memory
+        if torch.cuda.memory_reserved() / total > GPU_CACHE_PRESSURE:
+            torch.cuda.empty_cache()
 
 
 def get_prompt(self, tokenizer, previous_tokens, without_timestamps, prefix):
@@ -63,23 +117,43 @@ def get_prompt(self, tokenizer, previous_tokens, without_timestamps, prefix):
     return prompt
 
 
+def log_mel_window(audio, n_mels):
+    """log_mel_spectrogram of audio zero-padded to 30 s, without running the STFT over the padding."""
+    if audio.shape[0] >= N_SAMPLES:
+        return log_mel_spectrogram(audio[:N_SAMPLES], n_mels=n_mels)
+    # Frames starting past the end of the audio only see zeros, so one FFT length of
+    # padding is enough; the remaining frames are filled with zero power directly.
+    padded = torch.nn.functional.pad(torch.from_numpy(audio), (0, N_FFT))
+    stft = torch.stft(padded, N_FFT, HOP_LENGTH, window=torch.hann_window(N_FFT), return_complex=True)
+    power = mel_filters(padded.device, n_mels) @ stft.abs() ** 2
+    n_frames = min(N_FRAMES, power.shape[1])
+    mel_spec = power.new_zeros(n_mels, N_FRAMES)
+    mel_spec[:, :n_frames] = power[:, :n_frames]
+    log_spec = torch.clamp(mel_spec, min=1e-10).log10()
+    log_spec = torch.maximum(log_spec, log_spec.max() - 8.0)
+    return (log_spec + 4.0) / 4.0
+
+
 def detect_language(audio, model):
+    return detect_languages([audio], model)[0]
+
+
+def detect_languages(audios, model, batch_size=8):
+    """Detect the language of each audio window, running the encoder once per batch."""
     model_n_mels = model.model.feat_kwargs.get("feature_size")
-    segment = log_mel_spectrogram(
-        audio[:N_SAMPLES],
-        n_mels=model_n_mels if model_n_mels is not None else 80,
-        padding=0 if audio.shape[0] >= N_SAMPLES else N_SAMPLES - audio.shape[0],
-    )
-    encoder_output = model.model.encode(segment)
-    results = model.model.model.detect_language(encoder_output)
-    language_token, language_probability = results[0][0]
-    language = language_token[2:-2]
-    return (language, language_probability)
+    n_mels = model_n_mels if model_n_mels is not None else 80
+    detected = []
+    for i in range(0, len(audios), batch_size):
+        segments = torch.stack([log_mel_window(audio, n_mels) for audio in audios[i : i + batch_size]])
+        encoder_output = model.model.encode(segments)
+        for results in model.model.model.detect_language(encoder_output):
+            language_token, language_probability = results[0]
+            detected.append((language_token[2:-2], language_probability))
+    return detected
 
 
 def transcribe(
     audio,
-    pipeline,
     diarize_model,
     device,
     num_speaker,
@@ -89,9 +163,9 @@ def transcribe(
     multi_mode_track=None,
     language="de",
     model=None,  # Add model parameter with default None
+    audio_filter=None,
+    duration=None,
 ):
-    torch.cuda.empty_cache()
-
     # Define sample rate for audio processing
     SAMPLE_RATE = 16000  # Standard for whisper models
     
@@ -118,7 +192,7 @@ def transcribe(
         try:
             print(f"Processing audio using custom ffmpeg_read with -vn flag support...")
             # First convert audio file using our custom function for MP4 support
-            audio_array = custom_ffmpeg_read(audio, SAMPLE_RATE)
+            audio_array = custom_ffmpeg_read(audio, SAMPLE_RATE, audio_filter, duration)
             print(f"Audio processed successfully, shape: {audio_array.shape}")
             
             # Then use WhisperX with the pre-processed audio
@@ -159,6 +233,7 @@ def transcribe(
     if add_language:
         start_language = time.time()
         print("Adding language...")
+        segment_audios = []
         for segment in result2["segments"]:
             start = max(0, (int(segment["start"]) * 16_000) - 8_000)
             end = min(len(audio_array), ((int(segment["end"]) + 1) * 16_000) + 8_000)
@@ -171,7 +246,11 @@ def transcribe(
                 )
                 segment["language"] = language["language"]
             else:
-                detected_language, language_probability = detect_language(segment_audio, model)
+                segment_audios.append(segment_audio)
+        if segment_audios:
+            # Encode the segment windows in batches instead of one encoder call per segment
+            detected = detect_languages(segment_audios, model, batch_size=batch_size)
+            for segment, (detected_language, language_probability) in zip(result2["segments"], detected):
                 segment["language"] = detected_language if language_probability > 0.85 else language
         print(f"Adding language took {time.time() - start_language:.2f} seconds.")
 
@@ -190,9 +269,17 @@ def transcribe(
             print(f"Running speaker diarization...")
             segments = diarize_model(audio_data, num_speakers=num_speaker)
 
-            diarize_df = pd.DataFrame(segments.itertracks(yield_label=True), columns=["segment", "label", "speaker"])
-            diarize_df["start"] = diarize_df["segment"].apply(lambda x: x.start)
-            diarize_df["end"] = diarize_df["segment"].apply(lambda x: x.end)
+            # Build all columns in one pass over the tracks instead of two per-row .apply calls
+            tracks = list(segments.itertracks(yield_label=True))
+            diarize_df = pd.DataFrame(
+                {
+                    "segment": [turn for turn, _, _ in tracks],
+                    "label": [label for _, label, _ in tracks],
+                    "speaker": [speaker for _, _, speaker in tracks],
+                    "start": np.fromiter((turn.start for turn, _, _ in tracks), dtype=np.float64, count=len(tracks)),
+                    "end": np.fromiter((turn.end for turn, _, _ in tracks), dtype=np.float64, count=len(tracks)),
+                }
+            )
             
             print(f"Assigning speakers to words...")
             result3 = whisperx.assign_word_speakers(diarize_df, result2)
@@ -208,19 +295,16 @@ def transcribe(
 
     print(f"Diarization took {time.time() - start_diarize:.2f} seconds.")
     print(f"Total time: {time.time() - start_time:.2f} seconds.")
-    torch.cuda.empty_cache()
+    release_gpu_cache()
     if DEVICE == "mps":
         torch.mps.empty_cache()
     # Text cleanup.
     cleaned_segments = []
+    leak_pattern = DATA_LEAK_PATTERNS.get(result1["language"])
     for segment in result3["segments"]:
-        if result1["language"] in data_leaks:
-            for line in data_leaks[result1["language"]]:
-                if line in segment["text"]:
-                    segment["text"] = segment["text"].replace(line, "")
-        segment["text"] = segment["text"].strip()
-
-        if len(segment["text"]) > 0:
+        text = leak_pattern.sub("", segment["text"]) if leak_pattern else segment["text"]
+        segment["text"] = text = text.strip()
+        if text:
             cleaned_segments.append(segment)
 
     return cleaned_segments
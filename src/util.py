@@ -1,37 +1,77 @@
 from pydub import AudioSegment
+import numpy as np
 import subprocess
+import math
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 DEVICE = os.getenv("DEVICE")
 
+CHUNK_LENGTH_MS = 100
+# Gain (-100 dB) applied to chunks in which another track is louder
+ATTENUATION = 10 ** (-100 / 20)
+# Sample rate whisper transcribes at
+TRACK_SAMPLE_RATE = 16000
+
 
 def isolate_voices(file_paths):
-    for index in range(len(file_paths)):
-        chunk_length_ms = 100
-        chunked = []
-        for file in file_paths:
-            audio = AudioSegment.from_file(file)
-            chunked.append([audio[i : i + chunk_length_ms] for i in range(0, len(audio), chunk_length_ms)])
+    """Attenuate each 100 ms chunk of a track wherever another track is louder.
+
+    The isolated tracks are written next to the originals as <track>.wav, whose paths are returned.
+    They are only meant for transcription: whisper resamples to 16 kHz mono anyway, and custom_ffmpeg_read
+    reads such a WAV without ffmpeg. The originals are left untouched for playback.
+    """
+    audios = []
+    for file in file_paths:
+        audio = AudioSegment.from_file(file).set_channels(1).set_frame_rate(TRACK_SAMPLE_RATE).set_sample_width(2)
+        audios.append(audio)
 
-        processed_chunks = [
-            filter_nondominant_voice([chunks[i] for chunks in chunked], index) for i in range(len(chunked[0]))
-        ]
+    # Decode every track once and compare chunk levels as arrays, instead of
+    # re-decoding all tracks and building an AudioSegment per chunk for each output.
+    n_chunks = min(math.ceil(len(audio) / CHUNK_LENGTH_MS) for audio in audios)
+    tracks = []
+    for audio in audios:
+        samples = np.array(audio.get_array_of_samples())
+        bounds = np.minimum(
+            np.arange(n_chunks + 1) * CHUNK_LENGTH_MS * audio.frame_rate // 1000, int(audio.frame_count())
+        )
+        tracks.append((audio, samples, bounds, chunk_dbfs(audio, samples, bounds)))
 
-        processed_audio = sum(processed_chunks)
-        processed_audio.export(file_paths[index])
+    loudest = np.max([levels for _, _, _, levels in tracks], axis=0)
+    out_paths = [file + ".wav" for file in file_paths]
+    for out_path, (audio, samples, bounds, levels) in zip(out_paths, tracks):
+        gain = np.where(levels < loudest, ATTENUATION, 1.0)
+        gain = np.repeat(np.repeat(gain, np.diff(bounds)), audio.channels)
+        processed = np.floor(samples[: bounds[-1] * audio.channels] * gain).astype(samples.dtype)
+        AudioSegment(
+            processed.tobytes(),
+            sample_width=audio.sample_width,
+            frame_rate=audio.frame_rate,
+            channels=audio.channels,
+        ).export(out_path, format="wav")
+    return out_paths
 
 
-def filter_nondominant_voice(segments, index):
-    value = segments[index].dBFS
-    for i, segment in enumerate(segments):
-        if i == index:
-            continue
-        if segment.dBFS > value:
-            return segment - 100
-    return segments[index]
+def chunk_dbfs(audio, samples, bounds):
+    """Return the dBFS of the frames between consecutive bounds, like AudioSegment.dBFS per chunk."""
+    energy = np.square(samples, dtype=np.float64).reshape(-1, audio.channels).sum(axis=1)
+    cumulative = np.concatenate(([0.0], np.cumsum(energy)))
+    counts = np.diff(bounds) * audio.channels
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rms = np.sqrt((cumulative[bounds[1:]] - cumulative[bounds[:-1]]) / counts)
+        levels = 20 * np.log10(rms / audio.max_possible_amplitude)
+    return np.where(counts > 0, levels, -np.inf)
 
 
 def get_length(filename):
+    """Return the duration of filename in seconds, probing it only once per version."""
+    st = os.stat(filename)
+    return probe_length(filename, st.st_mtime_ns, st.st_size)
+
+
+@lru_cache(maxsize=1024)
+def probe_length(filename, mtime_ns, size):
     result = subprocess.run(
         [
             "ffprobe",
@@ -49,12 +89,26 @@ def get_length(filename):
     return float(result.stdout)
 
 
-def time_estimate(filename, online=True):
+def get_lengths(filenames):
+    """Probe several files concurrently; unreadable files map to None."""
+
+    def length_or_none(filename):
+        try:
+            return get_length(filename)
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+        return list(executor.map(length_or_none, filenames))
+
+
+def time_estimate(filename, online=True, probe_info=None):
     try:
         # For now, we don't predict the wait time for zipped files in the queue.
         if filename[-4:] == ".zip":
             return 1, 1
-        run_time = get_length(filename)
+        # Callers that already ran ffmpeg.probe pass its output to spare another ffprobe
+        run_time = float(probe_info["format"]["duration"]) if probe_info else get_length(filename)
         if online:
             if DEVICE == "mps":
                 return run_time / 5, run_time
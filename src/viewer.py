@@ -30,7 +30,7 @@ def create_viewer(data, file_path, encode_base64, combine_speaker, root, languag
 
 def header(root):
     content = ""
-    with open(root + "data/bootstrap_content.txt", "r") as f:
+    with open(os.path.join(root, "data", "bootstrap_content.txt"), "r") as f:
         bootstrap_content = f.read()
 
     content += "<!doctype html>\n<html lang=\"en\">\n<meta http-equiv='Content-Type' content='text/html;charset=UTF-8'>\n<head>\t\n\t<style>\n\t\t@charset \"UTF-8\";/*!\n\t\t * Bootstrap  v5.3.2 (https://getbootstrap.com/)\n\t\t * Copyright 2011-2023 The Bootstrap Authors\n\t\t * Licensed under MIT (https://github.com/twbs/bootstrap/blob/main/LICENSE)\n\t\t"
@@ -41,7 +41,7 @@ def header(root):
 
 
 def navbar(root):
-    with open(root + "data/logo.txt", "r") as f:
+    with open(os.path.join(root, "data", "logo.txt"), "r") as f:
         logo = f.read()
     content = "<body>"
     content += "\n"
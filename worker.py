@@ -1,3 +1,5 @@
+import gc
+import heapq
 import os
 import shutil
 import time
@@ -9,21 +11,37 @@ import zipfile
 import logging
 import whisperx
 
+from concurrent.futures import ThreadPoolExecutor
 from os.path import isfile, join, normpath, basename, dirname
 from dotenv import load_dotenv
 from pyannote.audio import Pipeline
+
+try:
+    from watchfiles import watch
+except ImportError:
+    watch = None
+
+try:
+    # Only used on MPS (macOS); the module doesn't exist on Windows
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    # Processing markers are locked while their job runs; without fcntl (Windows) they expire by age
+    import fcntl
+except ImportError:
+    fcntl = None
+
 from src.metrics import (
     initialize_metrics, track_file_processed, track_queue_size,
-    track_transcription_error, track_audio_duration, time_transcription
+    track_audio_duration, time_transcription
 )
 
 from src.viewer import create_viewer
 from src.srt import create_srt
 from src.transcription import transcribe, get_prompt
-from src.util import time_estimate, isolate_voices
-
-# Load model directly
-from transformers import AutoProcessor, AutoModelForSpeechSeq2Seq, pipeline
+from src.util import time_estimate, get_lengths, isolate_voices
 
 # Load environment variables
 load_dotenv()
@@ -34,6 +52,37 @@ DEVICE = os.getenv("DEVICE")
 ROOT = os.getenv("ROOT")
 WINDOWS = os.getenv("WINDOWS") == "True"
 BATCH_SIZE = int(os.getenv("BATCH_SIZE"))
+# pyannote diarization pipeline; "pyannote/speaker-diarization-3.1" runs in pure PyTorch and is faster
+DIARIZATION_MODEL = os.getenv("DIARIZATION_MODEL", "pyannote/speaker-diarization")
+# Optional CTranslate2 compute type for Whisper, e.g. "int8_float16"; defaults to unquantized weights
+COMPUTE_TYPE = os.getenv("COMPUTE_TYPE")
+# Directories inside data/in that never hold queued uploads (the frontend clears in/<user>/tmp)
+SKIPPED_DIRS = {"tmp", "__pycache__"}
+# On MPS the worker restarts itself to shed leaked memory, but only after this many files
+# or once its peak resident memory crosses MPS_MAX_RSS_GB, instead of after every file.
+# Band filter applied to the voices, both for the editor's media file and for transcription
+VOICE_FILTER = "lowpass=3000,highpass=200"
+# How long the idle worker waits for changes in data/in before rescanning anyway,
+# so stuck processing markers still expire without new uploads
+IDLE_RESCAN_TIMEOUT = 30
+MPS_RESTART_AFTER = int(os.getenv("MPS_RESTART_AFTER", "10"))
+MPS_MAX_RSS_GB = float(os.getenv("MPS_MAX_RSS_GB", "16"))
+
+# Contents of the users' hotwords.txt and language.txt by path, with the (mtime_ns, size) they were read at
+user_settings = {}
+
+# Seconds a worker may take from creating a processing marker to locking it
+MARKER_CLAIM_GRACE = 5
+
+# Files this process has claimed and not finished yet, including those whose outputs are still being written,
+# with the descriptor that holds the lock on their processing marker
+claimed_files = {}
+
+# Encodes the editor's media file of the current job while it is transcribed
+media_executor = ThreadPoolExecutor(max_workers=1)
+
+# Builds and writes the outputs of a finished job while the next one is transcribed
+output_executor = ThreadPoolExecutor(max_workers=1)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -47,16 +96,66 @@ if WINDOWS:
 
 
 def mark_file_as_processing(file_path):
-    """Create a simple state file to indicate a file is being processed."""
+    """Create a state file to indicate a file is being processed.
+
+    The file is created exclusively, so of several workers only one claims a file; returns False
+    if another worker got there first. The marker holds the start time and the pid of the worker,
+    and stays locked until release_claim, so other workers can tell a running job from a dead one.
+    """
     state_file = file_path + ".processing"
     try:
-        with open(state_file, "w") as f:
-            f.write(str(int(time.time())))
-        logger.info(f"Marked file as processing: {file_path}")
-        return state_file
+        fd = os.open(state_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        logger.info(f"File already claimed by another worker: {file_path}")
+        return False
     except Exception as e:
         logger.error(f"Failed to mark file as processing: {file_path}, error: {str(e)}")
+        return True
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as e:
+            logger.warning(f"Could not lock processing marker of {file_path}, it expires by age: {str(e)}")
+    os.write(fd, f"{int(time.time())} {os.getpid()}".encode())
+    claimed_files[file_path] = fd
+    logger.info(f"Marked file as processing: {file_path}")
+    return True
+
+
+def release_claim(file_path):
+    """Remove the processing marker of a claimed file, if still there, and release its lock."""
+    try:
+        os.remove(file_path + ".processing")
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"Could not remove processing marker: {str(e)}")
+    # Unlock only after the marker is gone, so no other worker takes it for a dead one in between
+    fd = claimed_files.pop(file_path, None)
+    if fd is not None:
+        os.close(fd)
+
+
+def marker_locked(processing_marker):
+    """Whether a running worker holds the lock of a processing marker, or None if locks aren't available.
+
+    Unlike a pid, the lock is released by the kernel when its worker dies and is visible from
+    other containers sharing data/.
+    """
+    if fcntl is None:
+        return None
+    fd = os.open(processing_marker, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    except OSError:
+        # The file system doesn't support locks
         return None
+    finally:
+        os.close(fd)
+    return False
+
 
 def should_process_file(file_path):
     """Check if a file should be processed based on state files."""
@@ -72,23 +171,28 @@ def should_process_file(file_path):
         
     # Skip if currently processing or previously failed
     processing_marker = file_path + ".processing"
+    if file_path in claimed_files:
+        logger.debug(f"File currently being processed, skipping: {file_path}")
+        return False
     if os.path.exists(processing_marker):
         # Check if processing for too long (stuck)
         try:
-            with open(processing_marker, "r") as f:
-                start_time = int(f.read().strip())
-                # If processing for more than 10 minutes, consider it failed
-                if time.time() - start_time > 600:
-                    logger.warning(f"File processing stuck for >10 min, marking as failed: {file_path}")
-                    # Move to error state
-                    report_error(
-                        file_path,
-                        join(ROOT, "data", "error", user_id, file),
-                        user_id,
-                        "Verarbeitung fehlgeschlagen oder steckengeblieben"
-                    )
-                else:
-                    logger.debug(f"File currently being processed, skipping: {file_path}")
+            locked = marker_locked(processing_marker)
+            # The marker is written once, when the file is claimed
+            age = time.time() - os.stat(processing_marker).st_mtime
+            # An unlocked marker belongs to a worker that is gone, unless it was claimed just now and is
+            # about to be locked. Without locks, consider the file failed after 10 minutes.
+            if (locked is False and age > MARKER_CLAIM_GRACE) or (locked is None and age > 600):
+                logger.warning(f"File processing stuck or its worker is gone, marking as failed: {file_path}")
+                # Move to error state
+                report_error(
+                    file_path,
+                    join(ROOT, "data", "error", user_id, file),
+                    user_id,
+                    "Verarbeitung fehlgeschlagen oder steckengeblieben"
+                )
+            else:
+                logger.debug(f"File currently being processed, skipping: {file_path}")
             return False
         except Exception as e:
             logger.error(f"Invalid processing state file for {file_path}, error: {str(e)}")
@@ -140,17 +244,115 @@ def report_error(file_name, file_name_error, user_id, text=""):
             logger.info(f"Removed processing marker: {processing_marker}")
     except Exception as e:
         logger.error(f"Could not remove processing marker: {str(e)}")
+    release_claim(file_name)
 
 
-def oldest_files(folder):
-    matches = []
-    times = []
-    for root, _, filenames in os.walk(folder):
-        for filename in fnmatch.filter(filenames, "*.*"):
-            file_path = join(root, filename)
-            matches.append(file_path)
-            times.append(os.path.getmtime(file_path))
-    return [m for _, m in sorted(zip(times, matches))]
+def read_user_setting(user_id, name):
+    """Return the text of data/in/<user_id>/<name>, or None if it doesn't exist.
+
+    The text is cached and only read again when the file's mtime or size changes.
+    """
+    path = join(ROOT, "data", "in", user_id, name)
+    try:
+        st = os.stat(path)
+    except OSError:
+        user_settings.pop(path, None)
+        return None
+    version = (st.st_mtime_ns, st.st_size)
+    cached = user_settings.get(path)
+    if cached is None or cached[0] != version:
+        with open(path, "r", encoding="utf-8") as h:
+            cached = user_settings[path] = (version, h.read())
+    return cached[1]
+
+
+def scan_files(folder):
+    """Yield (mtime, path) for all files below folder with a dot in their name.
+
+    scandir already knows the entry types, and the stat of an entry is cached, so every file costs
+    one stat at most; os.walk + getmtime needed a stat per entry to tell files apart and one more for the mtime.
+    """
+    try:
+        with os.scandir(folder) as it:
+            entries = list(it)
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_dir():
+                # Like os.walk, don't descend into linked directories; hidden and temporary ones hold no uploads
+                if not entry.is_symlink() and not entry.name.startswith(".") and entry.name not in SKIPPED_DIRS:
+                    yield from scan_files(entry.path)
+            elif "." in entry.name:
+                yield entry.stat().st_mtime, entry.path
+        except OSError:
+            # Removed while scanning
+            continue
+
+
+def queued_files(folder):
+    """Yield (mtime, path) for the files below folder that are waiting to be transcribed.
+
+    Finished files are recognised from one listing of each user's output directory and
+    processing markers from the scan itself, so only files with a marker need a closer look.
+    """
+    entries = list(scan_files(folder))
+    scanned = {path for _, path in entries}
+    finished = {}
+    for mtime, file_path in entries:
+        file = basename(file_path)
+
+        # Skip config files, processing markers and uploads that are still being written
+        if file in ("hotwords.txt", "language.txt") or file.endswith((".processing", ".partial")):
+            continue
+
+        user_id = normpath(dirname(file_path)).split(os.sep)[-1]
+        if user_id not in finished:
+            try:
+                finished[user_id] = set(os.listdir(join(ROOT, "data", "out", user_id)))
+            except OSError:
+                finished[user_id] = set()
+        if file + ".html" in finished[user_id]:
+            continue
+
+        # Currently processing, stuck or failed (should_process_file handles the marker)
+        if file_path + ".processing" in scanned and not should_process_file(file_path):
+            continue
+
+        yield mtime, file_path
+
+
+def has_video_stream(streams):
+    return any(stream["codec_type"] == "video" for stream in streams)
+
+
+def filter_media(file_names, file_name_out, has_video):
+    """Write file_name_out with the voice band filtered and any video shrunk, in one ffmpeg run.
+
+    Several inputs are mixed with amix inside the same filter graph, so each input is decoded once.
+    Returns False if ffmpeg failed.
+    """
+    inputs = [ffmpeg.input(f) for f in file_names]
+    if len(inputs) == 1:
+        audio = inputs[0].audio
+    else:
+        audio = ffmpeg.filter([i.audio for i in inputs], "amix", inputs=len(inputs), duration="first")
+    audio = audio.filter("lowpass", 3000).filter("highpass", 200)  # VOICE_FILTER
+    if not has_video:
+        outputs = [ffmpeg.output(audio, file_name_out)]
+    else:
+        outputs = [
+            ffmpeg.output(inputs[0].video.filter("scale", 320, -2), audio, file_name_out),
+            # Streams the scale filter can't handle are copied as they are
+            ffmpeg.output(inputs[0].video, audio, file_name_out, vcodec="copy"),
+        ]
+    for output in outputs:
+        try:
+            output.overwrite_output().run(quiet=True)
+            return True
+        except ffmpeg.Error as e:
+            logger.warning(f"ffmpeg failed for {file_name_out}: {e.stderr.decode(errors='replace')[-500:]}")
+    return False
 
 
 @time_transcription
@@ -169,24 +371,36 @@ def transcribe_file(file_name, multi_mode=False, multi_mode_track=None, audio_fi
     file_name_error = join(ROOT, "data", "error", user_id, file)
     file_name_out = join(ROOT, "data", "out", user_id, file + ".mp4")
 
-    # Clean up worker directory
+    # Clean up worker directory: progress files left over from an interrupted run are stale,
+    # the directory itself is kept instead of being removed and recreated for every file.
+    # Progress files of earlier jobs whose outputs are still being written are kept.
     if not multi_mode:
         worker_user_dir = join(ROOT, "data", "worker", user_id)
-        if os.path.exists(worker_user_dir):
+        writing = {basename(f) for f in list(claimed_files) if f != file_name and dirname(f) == dirname(file_name)}
+        try:
+            with os.scandir(worker_user_dir) as it:
+                stale = [
+                    entry.path
+                    for entry in it
+                    if entry.is_file() and entry.name.split("_", 2)[-1] not in writing
+                ]
+        except FileNotFoundError:
+            stale = []
+        for path in stale:
             try:
-                shutil.rmtree(worker_user_dir)
+                os.remove(path)
             except OSError as e:
-                logger.error(f"Could not remove folder: {worker_user_dir}. Error: {e}")
+                logger.error(f"Could not remove stale progress file: {path}. Error: {e}")
 
     # Create output directory
     if not multi_mode:
         output_user_dir = join(ROOT, "data", "out", user_id)
         os.makedirs(output_user_dir, exist_ok=True)
 
-    # Estimate run time
+    # Estimate run time; the same probe also answers the audio stream check below
     try:
-        time.sleep(2)
-        estimated_time, run_time = time_estimate(file_name, ONLINE)
+        probe_info = ffmpeg.probe(file_name)
+        estimated_time, run_time = time_estimate(file_name, ONLINE, probe_info=probe_info)
         logger.info(f"DEBUG: Estimated transcription time: {estimated_time} seconds for file {file_name}")
         if run_time == -1:
             report_error(file_name, file_name_error, user_id, "Datei konnte nicht gelesen werden")
@@ -212,17 +426,8 @@ def transcribe_file(file_name, multi_mode=False, multi_mode_track=None, audio_fi
     track_file_processed(file_name)
     
     # Check if file has a valid audio stream
-    try:
-        if not ffmpeg.probe(file_name, select_streams="a")["streams"]:
-            report_error(
-                file_name,
-                file_name_error,
-                user_id,
-                "Die Tonspur der Datei konnte nicht gelesen werden",
-            )
-            return data, estimated_time, progress_file_name
-    except ffmpeg.Error as e:
-        logger.exception("ffmpeg error during probing")
+    streams = probe_info["streams"]
+    if not any(stream["codec_type"] == "audio" for stream in streams):
         report_error(
             file_name,
             file_name_error,
@@ -232,34 +437,30 @@ def transcribe_file(file_name, multi_mode=False, multi_mode_track=None, audio_fi
         return data, estimated_time, progress_file_name
 
     # Process audio
-    if not multi_mode:
+    media_job = None
+    audio_filter = None
+    if multi_mode:
+        file_name_out = file_name
+    elif DEVICE != "mps":
+        # Encode the filtered media for the editor in the background while the GPU works. The
+        # transcription decodes the original with the same filter, so it doesn't wait for the encode.
+        media_job = media_executor.submit(filter_media, [file_name], file_name_out, has_video_stream(streams))
+        audio_filter = VOICE_FILTER
+        file_name_out = file_name
+    else:
         # Convert and filter audio
-        exit_status = os.system(
-            f'ffmpeg -y -i "{file_name}" -filter:v scale=320:-2 -af "lowpass=3000,highpass=200" "{file_name_out}"'
-        )
-        if exit_status == 256:
-            exit_status = os.system(
-                f'ffmpeg -y -i "{file_name}" -c:v copy -af "lowpass=3000,highpass=200" "{file_name_out}"'
-            )
-        if not exit_status == 0:
-            logger.exception("ffmpeg error during audio processing")
+        if not filter_media([file_name], file_name_out, has_video_stream(streams)):
+            logger.error("ffmpeg error during audio processing")
             file_name_out = file_name  # Fallback to original file
 
-    else:
-        file_name_out = file_name
-
     # Load hotwords
-    hotwords = []
-    hotwords_file = join(ROOT, "data", "in", user_id, "hotwords.txt")
-    if isfile(hotwords_file):
-        with open(hotwords_file, "r") as h:
-            hotwords = h.read().splitlines()
+    hotwords_text = read_user_setting(user_id, "hotwords.txt")
+    hotwords = hotwords_text.splitlines() if hotwords_text is not None else []
 
     # Transcribe
     try:
         data = transcribe(
             file_name_out,
-            pipe,
             diarize_model,
             DEVICE,
             None,
@@ -267,23 +468,97 @@ def transcribe_file(file_name, multi_mode=False, multi_mode_track=None, audio_fi
                 False if DEVICE == "mps" else True
             ),  # on MPS is rather slow and unreliable, but you can try with setting this to true
             hotwords=hotwords,
+            batch_size=BATCH_SIZE,
             multi_mode_track=multi_mode_track,
             language=language,
             model=model,  # Pass the WhisperX model
+            audio_filter=audio_filter,
+            duration=run_time,  # from the probe above, so the decode doesn't probe again
         )
     except Exception as e:
         logger.exception("Transcription failed")
         report_error(file_name, file_name_error, user_id, "Transkription fehlgeschlagen")
 
+    # The editor needs the media file, so it has to be written before the outputs are
+    if media_job is not None and not media_job.result():
+        logger.error("ffmpeg error during audio processing")
+
     return data, estimated_time, progress_file_name
+
+
+def write_atomic(path, text):
+    """Write text to a temporary file and rename it over path, so readers never see a partial file."""
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_outputs(data, file_name, user_id, language, estimated_time, progress_file_name):
+    """Write the SRT and editor of a finished transcription, then clear its progress and processing markers."""
+    file = basename(file_name)
+
+    # Generate outputs
+    try:
+        file_name_out = join(ROOT, "data", "out", user_id, file + ".mp4")
+
+        # Track audio duration for completed transcriptions
+        if data and len(data) > 0:
+            audio_duration = data[-1].get("end", 0)  # Get duration from last segment end time
+            track_audio_duration(audio_duration)
+
+        srt = create_srt(data)
+        viewer = create_viewer(data, file_name_out, True, False, ROOT, language)
+
+        file_name_srt = join(ROOT, "data", "out", user_id, file + ".srt")
+        file_name_viewer = join(ROOT, "data", "out", user_id, file + ".html")
+        # The frontend treats the .html file as "transcription finished", so write it last:
+        # once it appears, all outputs of the job are complete and the UI refreshes only once.
+        write_atomic(file_name_srt, srt)
+        write_atomic(file_name_viewer, viewer)
+
+        logger.info(f"Estimated Time: {estimated_time}")
+    except Exception as e:
+        logger.exception("Error creating editor")
+        report_error(
+            file_name,
+            join(ROOT, "data", "error", user_id, file),
+            user_id,
+            "Fehler beim Erstellen des Editors",
+        )
+
+    if progress_file_name:
+        try:
+            os.remove(progress_file_name)
+        except OSError:
+            pass
+
+    # Clean up processing marker after successful completion
+    try:
+        if os.path.exists(file_name + ".processing"):
+            os.remove(file_name + ".processing")
+            logger.info(f"Removed processing marker after successful transcription: {file_name}")
+    except Exception as e:
+        logger.error(f"Could not remove processing marker: {str(e)}")
+    release_claim(file_name)
+
+    logger.info(f"Successfully processed file: {file_name}")
+
+
 if __name__ == "__main__":
     WHISPER_DEVICE = "cpu" if DEVICE == "mps" else DEVICE
-    if WHISPER_DEVICE == "cpu":
+    if COMPUTE_TYPE:
+        compute_type = COMPUTE_TYPE
+    elif WHISPER_DEVICE == "cpu":
         compute_type = "float32"
     else:
         compute_type = "float16"
 
-    torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
     # Load models
     whisperx_model = (
         "tiny.en" if DEVICE == "mps" else "large-v3"
@@ -291,15 +566,6 @@ if __name__ == "__main__":
     if ONLINE:
         # Use WhisperX for transcription
         model = whisperx.load_model(whisperx_model, WHISPER_DEVICE, compute_type=compute_type)
-        
-        # Keep the transformers pipeline for backward compatibility
-        model_id = os.getenv("ASR_MODEL_ID")
-        pipe = pipeline(
-            "automatic-speech-recognition",
-            model_id,
-            device=DEVICE,
-            torch_dtype=torch_dtype,
-        )
     else:
         # Use WhisperX for transcription (offline mode)
         model = whisperx.load_model(
@@ -308,15 +574,6 @@ if __name__ == "__main__":
             compute_type=compute_type,
             download_root=join("models", "whisperx"),
         )
-        
-        # Keep the transformers pipeline for backward compatibility
-        model_id = os.getenv("ASR_MODEL_ID")
-        pipe = pipeline(
-            "automatic-speech-recognition",
-            model_id,
-            device=DEVICE,
-            torch_dtype=torch_dtype,
-        )
 
     model.model.get_prompt = types.MethodType(get_prompt, model.model)
     
@@ -342,12 +599,10 @@ if __name__ == "__main__":
         raise ValueError("Invalid Hugging Face token. Please check your .env file and update HF_AUTH_TOKEN.")
     
     try:
-        diarize_model = Pipeline.from_pretrained(
-            "pyannote/speaker-diarization", use_auth_token=hf_token
-        ).to(torch.device(DEVICE))
+        diarize_model = Pipeline.from_pretrained(DIARIZATION_MODEL, use_auth_token=hf_token).to(torch.device(DEVICE))
     except Exception as e:
         if "401 Client Error: Unauthorized" in str(e):
-            logger.error("""
+            logger.error(f"""
             ===================================================================
             ERROR: Hugging Face authentication failed!
             
@@ -355,7 +610,7 @@ if __name__ == "__main__":
             1. The token is invalid or expired
             2. You haven't accepted the model's license agreement
             
-            Please visit https://huggingface.co/pyannote/speaker-diarization
+            Please visit https://huggingface.co/{DIARIZATION_MODEL}
             and make sure you're logged in and have accepted the user agreement.
             Then check that your token in .env is correct and up to date.
             ===================================================================
@@ -383,27 +638,20 @@ if __name__ == "__main__":
     logger.info(disclaimer)
     logger.info("Worker ready")
 
+    files_done = 0
+    # Events for data/in keep accumulating while a file is processed, so none are missed between scans
+    input_changes = None
+    if watch is not None:
+        input_changes = watch(
+            join(ROOT, "data", "in"),
+            debounce=100,
+            rust_timeout=IDLE_RESCAN_TIMEOUT * 1000,
+            yield_on_timeout=True,
+        )
     while True:
         try:
-            # Get all files in input directory
-            files_sorted_by_date = oldest_files(join(ROOT, "data", "in"))
-            
             # Filter out non-processable files to get accurate queue size
-            actual_queue = []
-            for file_path in files_sorted_by_date:
-                file = basename(file_path)
-                user_id = normpath(dirname(file_path)).split(os.sep)[-1]
-                
-                # Skip config files
-                if file == "hotwords.txt" or file == "language.txt":
-                    continue
-                    
-                # Skip files that should not be processed (already processed, currently processing, etc.)
-                if not isfile(file_path) or not should_process_file(file_path):
-                    continue
-                    
-                # This file is in the queue
-                actual_queue.append(file_path)
+            actual_queue = list(queued_files(join(ROOT, "data", "in")))
             
             logger.info(f"Found {len(actual_queue)} files in queue")
             
@@ -412,23 +660,28 @@ if __name__ == "__main__":
             
             # Process files from the filtered queue
             if not actual_queue:
-                time.sleep(1)
+                if input_changes is None:
+                    time.sleep(1)
+                    continue
+                try:
+                    next(input_changes)
+                except Exception as e:
+                    logger.warning(f"Watching the input directory failed, polling instead: {str(e)}")
+                    input_changes = None
                 continue
                 
-            # Process the oldest file
-            file_name = actual_queue[0]
+            # Process the oldest file; only the head of the queue is needed, so no full sort
+            _, file_name = min(actual_queue)
             file = basename(file_name)
             user_id = normpath(dirname(file_name)).split(os.sep)[-1]
             
             # Mark file as processing to prevent reprocessing
             logger.info(f"Starting to process file: {file_name}")
-            processing_marker = mark_file_as_processing(file_name)
+            if not mark_file_as_processing(file_name):
+                continue
             
-            language_file = join(ROOT, "data", "in", user_id, "language.txt")
-            if isfile(language_file):
-                with open(language_file, "r") as h:
-                    language = h.read()
-            else:
+            language = read_user_setting(user_id, "language.txt")
+            if language is None:
                 language = "de"
 
             # Check if it's a zip file
@@ -439,17 +692,25 @@ if __name__ == "__main__":
                     os.makedirs(zip_extract_dir, exist_ok=True)
 
                     with zipfile.ZipFile(file_name, "r") as zip_ref:
-                        zip_ref.extractall(zip_extract_dir)
+                        # Only write the tracks to disk: skip directories, macOS resource forks and hidden files
+                        tracks = [
+                            info
+                            for info in zip_ref.infolist()
+                            if not info.is_dir()
+                            and not info.filename.startswith("__MACOSX/")
+                            and not basename(info.filename).startswith(".")
+                        ]
+                        zip_ref.extractall(zip_extract_dir, members=tracks)
 
                     multi_mode = True
                     data_parts = []
                     estimated_time = 0
-                    data = []
-                    file_parts = []
 
                     # Collect files from zip
                     for root, _, filenames in os.walk(zip_extract_dir):
                         audio_files = [fn for fn in filenames if fnmatch.fnmatch(fn, "*.*")]
+                        # Probe all tracks at once; time_estimate then reads the cached lengths
+                        get_lengths([join(root, filename) for filename in audio_files])
                         for filename in audio_files:
                             file_path = join(root, filename)
                             est_time_part, _ = time_estimate(file_path, ONLINE)
@@ -465,46 +726,23 @@ if __name__ == "__main__":
                     with open(progress_file_name, "w") as f:
                         f.write("")
 
-                    isolate_voices([join(root, filename) for filename in audio_files])
+                    track_paths = [join(root, filename) for filename in audio_files]
+                    isolated_paths = isolate_voices(track_paths)
 
-                    # Transcribe each file
-                    for track, filename in enumerate(audio_files):
-                        file_path = join(root, filename)
-                        file_parts.append(f'-i "{file_path}"')
+                    # Transcribe each isolated track
+                    for track, file_path in enumerate(isolated_paths):
                         data_part, _, _ = transcribe_file(file_path, multi_mode=True, multi_mode_track=track, language=language)
                         data_parts.append(data_part)
 
-                    # Merge data
-                    while any(data_parts):
-                        earliest = min(
-                            [(i, dp[0]) for i, dp in enumerate(data_parts) if dp],
-                            key=lambda x: x[1]["start"],
-                            default=(None, None),
-                        )
-                        if earliest[0] is None:
-                            break
-
-                        data.append(earliest[1])
-                        data_parts[earliest[0]].pop(0)
-
-                    # Merge audio files
-                    output_audio = join(ROOT, "data", "worker", "zip", "tmp.mp4")
-                    ffmpeg_input = " ".join(file_parts)
-                    ffmpeg_cmd = f'ffmpeg {ffmpeg_input} -filter_complex amix=inputs={len(file_parts)}:duration=first "{output_audio}"'
-                    os.system(ffmpeg_cmd)
-
-                    # Process merged audio
+                    # Merge data; each track is already in time order
+                    data = list(heapq.merge(*(dp for dp in data_parts if dp), key=lambda segment: segment["start"]))
+
+                    # Mix and filter the original tracks in one ffmpeg run, so playback keeps their quality
                     file_name_out = join(ROOT, "data", "out", user_id, file + ".mp4")
-                    exit_status = os.system(
-                        f'ffmpeg -y -i "{output_audio}" -filter:v scale=320:-2 -af "lowpass=3000,highpass=200" "{file_name_out}"'
-                    )
-                    if exit_status == 256:
-                        exit_status = os.system(
-                            f'ffmpeg -y -i "{output_audio}" -c:v copy -af "lowpass=3000,highpass=200" "{file_name_out}"'
-                        )
-                    if not exit_status == 0:
-                        logger.exception("ffmpeg error during audio processing")
-                        file_name_out = output_audio  # Fallback to original file
+                    if not filter_media(
+                        track_paths, file_name_out, has_video_stream(ffmpeg.probe(track_paths[0])["streams"])
+                    ):
+                        logger.error("ffmpeg error during audio processing")
 
                     shutil.rmtree(zip_extract_dir, ignore_errors=True)
                 except Exception as e:
@@ -521,6 +759,7 @@ if __name__ == "__main__":
                 data, estimated_time, progress_file_name = transcribe_file(file_name, language=language)
 
             if data is None:
+                release_claim(file_name)
                 continue
 
             # Check if the file still exists before generating outputs
@@ -528,53 +767,25 @@ if __name__ == "__main__":
                 logger.info(f"File was deleted during processing, cancelling output generation: {file_name}")
                 if progress_file_name and os.path.exists(progress_file_name):
                     os.remove(progress_file_name)
+                release_claim(file_name)
                 continue
 
-            # Generate outputs
-            try:
-                file_name_out = join(ROOT, "data", "out", user_id, file + ".mp4")
-                
-                # Track audio duration for completed transcriptions
-                if data and len(data) > 0:
-                    audio_duration = data[-1].get("end", 0)  # Get duration from last segment end time
-                    track_audio_duration(audio_duration)
-
-                srt = create_srt(data)
-                viewer = create_viewer(data, file_name_out, True, False, ROOT, language)
-
-                file_name_srt = join(ROOT, "data", "out", user_id, file + ".srt")
-                file_name_viewer = join(ROOT, "data", "out", user_id, file + ".html")
-                with open(file_name_viewer, "w", encoding="utf-8") as f:
-                    f.write(viewer)
-                with open(file_name_srt, "w", encoding="utf-8") as f:
-                    f.write(srt)
-
-                logger.info(f"Estimated Time: {estimated_time}")
-            except Exception as e:
-                logger.exception("Error creating editor")
-                report_error(
-                    file_name,
-                    join(ROOT, "data", "error", user_id, file),
-                    user_id,
-                    "Fehler beim Erstellen des Editors",
-                )
-
-            if progress_file_name and os.path.exists(progress_file_name):
-                os.remove(progress_file_name)
-                
-            # Clean up processing marker after successful completion
-            try:
-                if os.path.exists(file_name + ".processing"):
-                    os.remove(file_name + ".processing")
-                    logger.info(f"Removed processing marker after successful transcription: {file_name}")
-            except Exception as e:
-                logger.error(f"Could not remove processing marker: {str(e)}")
-                
-            logger.info(f"Successfully processed file: {file_name}")
+            # Write the outputs in the background; the next file can already be transcribed meanwhile
+            output_executor.submit(
+                write_outputs, data, file_name, user_id, language, estimated_time, progress_file_name
+            )
                 
             if DEVICE == "mps":
-                print("Exiting worker to prevent memory leaks with MPS...")
-                exit(0)  # Due to memory leak problems, we restart the worker after each transcription
+                files_done += 1
+                # ru_maxrss is reported in bytes on macOS
+                peak_rss_gb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024**3
+                if files_done >= MPS_RESTART_AFTER or peak_rss_gb > MPS_MAX_RSS_GB:
+                    print("Exiting worker to prevent memory leaks with MPS...")
+                    exit(0)  # Due to memory leak problems, the worker is restarted from time to time
+                # Keep the loaded models and only release what the last file left behind
+                data = None
+                gc.collect()
+                torch.mps.empty_cache()
 
             # Process one file at a time
             time.sleep(1)